@@ -0,0 +1,360 @@
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import threading
+import urllib.error
+import urllib.request
+from urllib.parse import urlencode
+
+from job_scheduler import SimulationJob
+from scratch_stager import ScratchStager
+from status_store import StatusStore
+
+class AgentError(RuntimeError):
+    def __init__(self, message: str, status: int):
+        super().__init__(message)
+        self.status = status
+
+
+class AgentClient:
+    def __init__(self, url: str, token: str = None, timeout: float = 60.0):
+        self.url = url.rstrip("/")
+        self.token = token
+        self.timeout = timeout
+
+    def _request(self, method: str, path: str, query: dict = None, payload=None, data: bytes = None,
+                 raw: bool = False, expected=(200, 201), timeout: float = None):
+        url = self.url + path + ("?" + urlencode(query) if query else "")
+        headers = {"X-Gmxauto-Token": self.token} if self.token else {}
+        if payload is not None:
+            data = json.dumps(payload).encode()
+            headers["Content-Type"] = "application/json"
+        request = urllib.request.Request(url, data=data, method=method, headers=headers)
+        try:
+            with urllib.request.urlopen(request, timeout=timeout or self.timeout) as response:
+                status, body = response.status, response.read()
+        except urllib.error.HTTPError as e:
+            status, body = e.code, e.read()
+        if raw and status == 200:
+            return status, body
+        result = json.loads(body or b"{}")
+        if status not in expected:
+            raise AgentError(f"{method} {url} failed ({status}): {result.get('error', result)}", status)
+        return status, result
+
+    def info(self, timeout: float = None) -> dict:
+        return self._request("GET", "/info", timeout=timeout)[1]
+
+    def create_job(self, spec: dict) -> str:
+        return self._request("POST", "/jobs", payload=spec)[1]["job_id"]
+
+    def upload(self, job_id: str, rel: str, path: str, chunk_size: int = ScratchStager.CHUNK_SIZE) -> None:
+        offset = 0
+        with open(path, 'rb') as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk and offset:
+                    break
+                _, result = self._request("PUT", f"/jobs/{job_id}/files", {"path": rel, "offset": offset}, data=chunk)
+                offset = result["offset"]
+                if len(chunk) < chunk_size:
+                    break
+
+    def start(self, job_id: str, manifest: list) -> list:
+        _, result = self._request("POST", f"/jobs/{job_id}/start", payload={"manifest": manifest},
+                                  expected=(200, 409))
+        if "error" in result:
+            raise AgentError(result["error"], 409)
+        return result["mismatched"]
+
+    def events(self, job_id: str, version: int, log_since: int, wait: float = 10.0) -> dict:
+        query = {"version": version, "log_since": log_since, "wait": wait}
+        return self._request("GET", f"/jobs/{job_id}/events", query)[1]
+
+    def manifest(self, job_id: str) -> list:
+        return self._request("GET", f"/jobs/{job_id}/manifest")[1]["files"]
+
+    def download(self, job_id: str, rel: str, path: str, size: int,
+                 chunk_size: int = ScratchStager.CHUNK_SIZE) -> None:
+        offset = 0
+        with open(path, 'wb') as f:
+            while offset < size:
+                _, data = self._request("GET", f"/jobs/{job_id}/files",
+                                        {"path": rel, "offset": offset, "length": chunk_size}, raw=True)
+                if not data:
+                    raise IOError(f"{rel} ended at {offset} of {size} bytes")
+                f.write(data)
+                offset += len(data)
+
+    def cancel(self, job_id: str) -> None:
+        self._request("POST", f"/jobs/{job_id}/cancel")
+
+    def delete(self, job_id: str) -> None:
+        self._request("DELETE", f"/jobs/{job_id}")
+
+
+class AgentController:
+    logger = logging.getLogger("AgentController")
+
+    def __init__(self, agents, token: str = None, status_store: StatusStore = None,
+                 poll_interval: float = 2.0, retries: int = 1, lost_after: float = 120.0,
+                 probe_timeout: float = 2.0):
+        self.agents = [agent if isinstance(agent, AgentClient) else AgentClient(agent, token) for agent in agents]
+        self.status_store = status_store or StatusStore()
+        self.poll_interval = poll_interval
+        self.retries = retries
+        self.lost_after = lost_after
+        self.probe_timeout = probe_timeout  # per agent, so one hung agent cannot stall dispatching to the others
+        self.jobs = []
+        self._reserved = {agent.url: {"gpus": 0, "cpu": 0} for agent in self.agents}
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+        self._lock = threading.RLock()
+
+    def submit(self, job: SimulationJob) -> SimulationJob:
+        with self._lock:
+            job.attempts = 0
+            job.agent = None
+            job.remote_id = None
+            self.jobs.append(job)
+            self.status_store.register(job.job_id, job.name)
+            self.logger.info(f"📥 Job {job.job_id} ({job.name}) queued with priority {job.priority}")
+        self._wake.set()
+        return job
+
+    def cancel(self, job: SimulationJob) -> None:
+        with self._lock:
+            if job.status == "queued":
+                job.status = "cancelled"
+                job.record("cancelled")
+                self.status_store.update(job.job_id, state="cancelled")
+                return
+        if job.agent and job.remote_id:
+            job.agent.cancel(job.remote_id)
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._loop, name="AgentController", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join()
+
+    def wait(self, timeout: float = None) -> bool:
+        deadline = time.time() + timeout if timeout else None
+        while any(job.status not in StatusStore.FINAL_STATES for job in self.jobs):
+            if deadline and time.time() > deadline:
+                return False
+            time.sleep(0.5)
+        return True
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self._dispatch()
+            except Exception as e:
+                self.logger.warning(f"⚠️ Dispatch cycle failed: {e}")
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def _capacity(self) -> dict:
+        capacity = {}
+        for agent in self.agents:
+            try:
+                info = agent.info(timeout=self.probe_timeout)
+            except (OSError, RuntimeError, ValueError) as e:
+                self.logger.debug(f"Agent {agent.url} skipped this cycle, capacity probe failed: {e}")
+                continue
+            reserved = self._reserved[agent.url]
+            capacity[agent.url] = {
+                "agent": agent,
+                "gpus": info["free_gpus"] - reserved["gpus"],
+                "total_gpus": len(info["gpus"]),
+                "cpu": info["free_cpu_slots"] - reserved["cpu"],
+                "running": info["running"],
+            }
+        return capacity
+
+    def _dispatch(self) -> None:
+        with self._lock:
+            pending = sorted((j for j in self.jobs if j.status == "queued"), key=lambda j: (-j.priority, j._submitted))
+        if not pending:
+            return
+        capacity = self._capacity()
+        for job in pending:
+            if job.engine == "CUDA":
+                candidates = [c for c in capacity.values() if c["gpus"] >= job.num_gpus]
+                # Prefer the agent that stays least loaded after taking the job
+                best = max(candidates, key=lambda c: ((c["gpus"] - job.num_gpus) / max(c["total_gpus"], 1),
+                                                      -c["running"]), default=None)
+            else:
+                candidates = [c for c in capacity.values() if c["cpu"] > 0]
+                best = max(candidates, key=lambda c: (c["cpu"], -c["running"]), default=None)
+            if best is None:
+                continue
+            key = "gpus" if job.engine == "CUDA" else "cpu"
+            amount = job.num_gpus if job.engine == "CUDA" else 1
+            best[key] -= amount
+            best["running"] += 1
+            with self._lock:
+                self._reserved[best["agent"].url][key] += amount
+                job.status = "running"
+                job.agent = best["agent"]
+                job.attempts += 1
+                job.record("dispatched", agent=best["agent"].url)
+            self.status_store.update(job.job_id, state="running", stage="Uploading")
+            self.logger.info(f"▶️ Dispatching job {job.job_id} to {best['agent'].url}")
+            threading.Thread(target=self._run, args=(job, key, amount), name=f"Dispatch-{job.job_id}",
+                             daemon=True).start()
+
+    def _manifest(self, folder: str) -> list:
+        files = []
+        for root, _, names in os.walk(folder):
+            for name in names:
+                path = os.path.join(root, name)
+                files.append({"path": os.path.relpath(path, folder).replace(os.sep, "/"),
+                              "size": os.path.getsize(path), "sha256": ScratchStager.checksum(path)})
+        return files
+
+    def _upload(self, job: SimulationJob, agent: AgentClient) -> None:
+        manifest = self._manifest(job.workdir)
+        spec = {"name": os.path.basename(os.path.normpath(job.name)), "num_gpus": job.num_gpus, "num_cores": job.num_cores, "duration": job.duration,
+                "unit": job.unit, "engine": job.engine, **job.options}
+        job.remote_id = agent.create_job(spec)
+        pending = [entry["path"] for entry in manifest]
+        for attempt in range(2):
+            for rel in pending:
+                agent.upload(job.remote_id, rel, os.path.join(job.workdir, rel))
+            pending = agent.start(job.remote_id, manifest)
+            if not pending:
+                return
+            self.logger.warning(f"⚠️ Job {job.job_id}: {len(pending)} files arrived corrupted, re-sending")
+        raise IOError(f"Upload verification failed for {', '.join(pending)}")
+
+    def _follow(self, job: SimulationJob, agent: AgentClient) -> dict:
+        version, log_since, last_contact = 0, 0, time.time()
+        while True:
+            try:
+                event = agent.events(job.remote_id, version, log_since)
+            except (OSError, RuntimeError, ValueError) as e:
+                if time.time() - last_contact > self.lost_after:
+                    raise ConnectionError(f"Lost contact with {agent.url}: {e}")
+                time.sleep(self.poll_interval)
+                continue
+            last_contact = time.time()
+            record = event["record"]
+            version = record["version"]
+            log_since = event["log_total"]
+            for _, level, message in event["log"]:
+                self.status_store.append_log(job.job_id, level, message)
+            fields = {key: record[key] for key in ("stage", "percent", "step", "ns_per_day", "eta", "steps_per_second",
+                                                   "last_checkpoint")}
+            self.status_store.update(job.job_id, **fields)
+            if event["state"] in StatusStore.FINAL_STATES:
+                return event
+
+    def _download(self, job: SimulationJob, agent: AgentClient) -> int:
+        fetched = 0
+        for entry in agent.manifest(job.remote_id):
+            local = os.path.join(job.workdir, *entry["path"].split("/"))
+            if os.path.exists(local) and os.path.getsize(local) == entry["size"] \
+                    and ScratchStager.checksum(local) == entry["sha256"]:
+                continue
+            os.makedirs(os.path.dirname(local), exist_ok=True)
+            partial = local + ".part"
+            agent.download(job.remote_id, entry["path"], partial, entry["size"])
+            if ScratchStager.checksum(partial) != entry["sha256"]:
+                os.remove(partial)
+                raise IOError(f"Checksum mismatch for {entry['path']}")
+            os.replace(partial, local)
+            fetched += 1
+        return fetched
+
+    def _run(self, job: SimulationJob, key: str, amount: int) -> None:
+        agent = job.agent
+        reserved = True
+        try:
+            self._upload(job, agent)
+            with self._lock:
+                self._reserved[agent.url][key] -= amount
+                reserved = False
+            job.record("started", agent=agent.url, remote_id=job.remote_id)
+            event = self._follow(job, agent)
+            fetched = self._download(job, agent)
+            self.logger.info(f"📦 Job {job.job_id}: fetched {fetched} output files from {agent.url}")
+            agent.delete(job.remote_id)
+            with self._lock:
+                job.status = event["state"]
+                job.record(job.status, error=event["error"])
+            self.status_store.update(job.job_id, state=job.status, eta=None,
+                                     **({"percent": 100.0} if job.status == "finished" else {}))
+            self.logger.info(f"🏁 Job {job.job_id} {job.status} on {agent.url}")
+        except Exception as e:
+            if reserved and job.remote_id:
+                # The job never started, so the half-uploaded copy on the agent is useless
+                try:
+                    agent.delete(job.remote_id)
+                except (OSError, RuntimeError, ValueError):
+                    pass
+            with self._lock:
+                if reserved:
+                    self._reserved[agent.url][key] -= amount
+                # The agent answers 503 when it has no free GPU or CPU slot for the job
+                busy = isinstance(e, AgentError) and e.status == 503
+                # A busy agent is not the job's fault; anything else uses up one of its retries
+                if busy or job.attempts <= self.retries:
+                    job.status = "queued"
+                    job.record("requeued", agent=agent.url, error=str(e))
+                    if busy:
+                        job.attempts -= 1
+                else:
+                    job.status = "failed"
+                    job.record("failed", agent=agent.url, error=str(e))
+            self.status_store.update(job.job_id, state=job.status, **({"stage": "-"} if job.status == "queued" else {}))
+            self.status_store.append_log(job.job_id, "ERROR", f"❌ {agent.url}: {e}")
+            self.logger.warning(f"⚠️ Job {job.job_id} on {agent.url}: {e} → {job.status}")
+            self._wake.set()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Balance gmxauto jobs across remote agents")
+    parser.add_argument("folders", nargs="+", help="CHARMM-GUI gromacs folders to run")
+    parser.add_argument("--agent", action="append", required=True, help="agent URL, e.g. http://node1:8765")
+    parser.add_argument("--token", default=os.environ.get("GMXAUTO_AGENT_TOKEN"))
+    parser.add_argument("--engine", choices=["CUDA", "CPU"], default="CUDA")
+    parser.add_argument("--gpus", type=int, default=1)
+    parser.add_argument("--cores", type=int, default=0)
+    parser.add_argument("--duration", type=float, required=True)
+    parser.add_argument("--unit", choices=["ns", "ps"], default="ns")
+    parser.add_argument("--priority", type=int, default=0)
+    parser.add_argument("--probe-timeout", type=float, default=2.0,
+                        help="seconds an agent has to report its capacity before it is skipped for that cycle")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s: %(message)s")
+    controller = AgentController(args.agent, token=args.token, probe_timeout=args.probe_timeout)
+    jobs = [controller.submit(SimulationJob(os.path.abspath(folder), args.gpus, args.cores, args.duration, args.unit,
+                                            args.engine, priority=args.priority))
+            for folder in args.folders]
+    controller.start()
+    try:
+        while not controller.wait(timeout=30):
+            _, records = controller.status_store.changed_since(0)
+            for r in records:
+                print(f"  {r['name']:<40} {r['state']:<10} {r['stage']:<35} {r['percent']:5.1f}%")
+    except KeyboardInterrupt:
+        for job in jobs:
+            controller.cancel(job)
+        controller.wait()
+    controller.stop()
+    return 0 if all(job.status == "finished" for job in jobs) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,348 @@
+import io
+import os
+import sys
+import math
+import json
+import time
+import shutil
+import logging
+import argparse
+import platform
+import timeit
+import tarfile
+import tempfile
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# The comparison runs this script once per tree; TREE_VARIABLE selects the gmxauto sources it imports
+TREE_VARIABLE = "GMXAUTO_BENCH_TREE"
+sys.path.insert(0, os.environ.get(TREE_VARIABLE) or ROOT)
+
+from command_runner import CommandRunner
+from mdp_file_manager import MDPFileManager
+from gpu_command_builder import GPUCommandBuilder
+
+_app = None
+
+PRODUCTION_MDP = """define                  = -DPOSRES
+integrator              = md
+dt                      = 0.002
+nsteps                  = 500000
+nstxout-compressed      = 50000
+nstxout                 = 0
+nstvout                 = 0
+nstfout                 = 0
+nstcalcenergy           = 100
+nstenergy               = 1000
+nstlog                  = 1000
+;
+cutoff-scheme           = Verlet
+nstlist                 = 20
+rlist                   = 1.2
+vdwtype                 = Cut-off
+vdw-modifier            = Force-switch
+rvdw_switch             = 1.0
+rvdw                    = 1.2
+coulombtype             = PME
+rcoulomb                = 1.2
+;
+tcoupl                  = v-rescale
+tc_grps                 = SOLU SOLV
+tau_t                   = 1.0 1.0
+ref_t                   = 303.15 303.15
+;
+pcoupl                  = C-rescale
+pcoupltype              = isotropic
+tau_p                   = 5.0
+compressibility         = 4.5e-5
+ref_p                   = 1.0
+;
+constraints             = h-bonds
+constraint_algorithm    = LINCS
+continuation            = yes
+;
+nstcomm                 = 100
+comm_mode               = linear
+comm_grps               = SOLU SOLV
+"""
+
+MDRUN_HEADER = [
+    "                      :-) GROMACS - gmx mdrun, 2025.1 (-:",
+    "Executable:   /usr/local/gromacs/bin/gmx",
+    "Command line:",
+    "  gmx mdrun -v -deffnm step5_1 -nb gpu -bonded gpu -pme gpu",
+    "Reading file step5_1.tpr, VERSION 2025.1 (single precision)",
+    "Changing nstlist from 20 to 300, rlist from 1.2 to 1.45",
+    "1 GPU selected for this run.",
+    "Using 1 MPI thread",
+    "Using 8 OpenMP threads",
+    "starting mdrun 'Title'",
+    "500000 steps,   1000.0 ps.",
+]
+
+
+def synthetic_mdrun_output(lines: int, minimization: bool = False) -> str:
+    body = lines - len(MDRUN_HEADER)
+    if minimization:
+        progress = (f"Step={i:>6d}, Dmax= 1.2e-02 nm, Epot= -1.23456e+06 Fmax= 2.34567e+04, atom= {i % 50000 + 1}"
+                    for i in range(body))
+    else:
+        progress = (f"imb F  1% pme/F 0.85 step {i * 100}, remaining wall clock time:  {body - i:>5d} s          "
+                    for i in range(body))
+    return "\n".join(MDRUN_HEADER) + "\n" + "\r".join(progress) + "\n"
+
+
+def summarize(timings: list, number: int) -> dict:
+    median = statistics.median(timings)
+    return {"seconds": median, "min": min(timings), "mad": statistics.median(abs(t - median) for t in timings),
+            "repeat": len(timings), "number": number, "samples": timings}
+
+
+def measure(func, repeat: int, number: int = None, setup=None) -> dict:
+    if number is None:
+        # Like timeit: batch fast calls until one sample takes at least 0.2 s
+        number, _ = timeit.Timer(func).autorange()
+    timings = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        timings.append((time.perf_counter() - start) / number)
+    return summarize(timings, number)
+
+
+def bench_progress_parsing(results: dict, max_lines: int, repeat: int) -> None:
+    size = 1000
+    while size <= max_lines:
+        for minimization in (False, True):
+            data = synthetic_mdrun_output(size, minimization)
+            parse = lambda: sum(1 for _ in CommandRunner.parse_progress(data, minimization))
+            name = f"progress_parse_{'em' if minimization else 'md'}_{size:.0e}".replace("+0", "")
+            stats = measure(parse, repeat)
+            stats["lines_per_second"] = size / stats["min"]
+            results[name] = stats
+            print(f"  {name:<32} {stats['min'] * 1000:10.2f} ms  ({stats['lines_per_second']:,.0f} lines/s)")
+        size *= 10
+
+
+def bench_mdrun_with_progress(results: dict, workdir: str, lines: int, repeat: int) -> None:
+    with open(os.path.join(workdir, "step5_production.mdp"), "w") as f:
+        f.write(PRODUCTION_MDP)
+    fake = os.path.join(workdir, "fake_mdrun.py")
+    with open(fake, "w") as f:
+        f.write(
+            "import sys, time\n"
+            "n = int(sys.argv[1])\n"
+            "for i in range(n):\n"
+            "    sys.stdout.write(f'\\rimb F  1% step {i * 5}, remaining wall clock time:    10 s   ')\n"
+            "    if i % (n // 10 or 1) == 0:\n"
+            "        sys.stdout.flush(); time.sleep(0.1)\n"
+            "print()\n"
+        )
+    command = f'"{sys.executable}" fake_mdrun.py {lines} -deffnm step5_1'
+    ticks = []
+    run = lambda: CommandRunner.run_mdrun_with_progress(command, "Benchmark", ticks.append, lambda: None, cwd=workdir)
+    stats = measure(run, repeat, number=1, setup=ticks.clear)
+    stats["callbacks"] = len(ticks)
+    name = f"run_mdrun_with_progress_{lines:.0e}".replace("+0", "")
+    results[name] = stats
+    print(f"  {name:<32} {stats['min'] * 1000:10.2f} ms  ({len(ticks)} progress callbacks)")
+
+
+def bench_mdp(results: dict, workdir: str, repeat: int) -> None:
+    path = os.path.join(workdir, "bench.mdp")
+    with open(path, "w") as f:
+        f.write(PRODUCTION_MDP)
+
+    def cycle():
+        MDPFileManager.read_nsteps(path)
+        MDPFileManager.write_nsteps(path, 250000)
+        MDPFileManager.extract_dt(path)
+        MDPFileManager.extract_and_replace_nstlist(path, 300)
+
+    results["mdp_read_write_cycle"] = measure(cycle, repeat)
+    print(f"  {'mdp_read_write_cycle':<32} {results['mdp_read_write_cycle']['min'] * 1e6:10.2f} us")
+
+
+def bench_command_builder(results: dict, repeat: int) -> None:
+    cases = [
+        ("gmx mdrun -v -deffnm step4.0_minimization", 1, "CUDA"),
+        ("gmx mdrun -v -deffnm step4.1_equilibration", 2, "CUDA"),
+        ("gmx mdrun -v -deffnm step5_1 -nb gpu -bonded gpu", 4, "CUDA"),
+        ("gmx mdrun -v -deffnm step5_1", 0, "CPU"),
+    ]
+
+    def build():
+        for base_cmd, gpus, engine in cases:
+            GPUCommandBuilder.build(base_cmd, gpus, 16, ",".join(str(i) for i in range(gpus)), engine,
+                                    extra_flags="-resetstep 90000 -nstlist 300 -nsteps 500000")
+
+    results["gpu_command_build"] = measure(build, repeat)
+    print(f"  {'gpu_command_build':<32} {results['gpu_command_build']['min'] * 1e6:10.2f} us")
+
+
+def bench_append_log(results: dict, workdir: str, messages: int, repeat: int) -> None:
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    try:
+        from PyQt6.QtWidgets import QApplication
+    except ImportError:
+        print("  append_log                       skipped (PyQt6 not installed)")
+        return
+    # gui_main attaches a gmxauto.log file handler relative to the working directory
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        from gui_main import MainWindow
+        # Keep the application alive between suite runs, gui_main's module-level signal dies with it
+        global _app
+        _app = app = QApplication.instance() or QApplication([])
+        window = MainWindow()
+
+        def log():
+            for i in range(messages):
+                window.append_log("INFO", f"⏳ Step 6: Production | Step {i * 100}/500000 | Progress: {i / messages * 100:.2f}%")
+            app.processEvents()
+
+        # Every sample starts from an empty log so later ones do not append to a longer document
+        stats = measure(log, repeat, number=1, setup=window.log_output.clear)
+        window.close()
+    finally:
+        os.chdir(cwd)
+    name = f"append_log_{messages:.0e}".replace("+0", "")
+    stats["messages_per_second"] = messages / stats["min"]
+    results[name] = stats
+    print(f"  {name:<32} {stats['min'] * 1000:10.2f} ms  ({stats['messages_per_second']:,.0f} messages/s)")
+
+
+def run_suite(args) -> dict:
+    results = {}
+    workdir = tempfile.mkdtemp(prefix="gmxauto_bench_")
+    try:
+        print("📊 Progress parsing")
+        bench_progress_parsing(results, args.max_lines, args.repeat)
+        bench_mdrun_with_progress(results, workdir, 100000, args.repeat)
+        print("📊 MDP read/write")
+        bench_mdp(results, workdir, args.repeat)
+        print("📊 Command building")
+        bench_command_builder(results, args.repeat)
+        print("📊 GUI log throughput")
+        bench_append_log(results, workdir, args.log_messages, args.repeat)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def export_tree(ref: str, dest: str) -> None:
+    archive = subprocess.run(["git", "-C", ROOT, "archive", "--format=tar", ref], capture_output=True, check=True)
+    with tarfile.open(fileobj=io.BytesIO(archive.stdout)) as tar:
+        tar.extractall(dest, **({"filter": "data"} if hasattr(tarfile, "data_filter") else {}))
+
+
+def run_tree(tree: str, args, output: str) -> dict:
+    # A fresh interpreter per run, so head and base never share imported modules
+    command = [sys.executable, os.path.abspath(__file__), "--measure-only", "--output", output,
+               "--repeat", str(args.repeat), "--max-lines", str(args.max_lines),
+               "--log-messages", str(args.log_messages)]
+    # A fixed hash seed keeps string hashing, and with it dict layout, the same in every run
+    env = {**os.environ, TREE_VARIABLE: tree, "PYTHONHASHSEED": "0"}
+    subprocess.run(command, env=env, stdout=subprocess.DEVNULL, check=True)
+    with open(output) as f:
+        return json.load(f)["results"]
+
+
+def sign_test(ratios: list) -> float:
+    # One-sided p-value of the head being slower in this many rounds if head and base were equally fast
+    n, slower = len(ratios), sum(1 for ratio in ratios if ratio > 1.0)
+    return sum(math.comb(n, k) for k in range(slower, n + 1)) / 2 ** n
+
+
+def compare(head: list, base: list, min_slowdown: float, alpha: float) -> dict:
+    # Each round's best-of-N times form a pair measured back to back, so drift of the machine between
+    # rounds cancels in the ratio. A benchmark regresses if the median ratio is above the allowed slowdown
+    # and the head was slower in significantly many rounds. The significance level is split across the
+    # benchmarks (Bonferroni), otherwise one of them would fail by chance in many runs without a change
+    names = [name for name in head[0] if all(name in run for run in head + base)]
+    alpha /= max(len(names), 1)
+    comparison = {}
+    print(f"\n{'benchmark':<34}{'base':>12}{'head':>12}{'ratio':>8}{'slower':>8}{'p':>8}")
+    for name in names:
+        pairs = [(h[name]["min"], b[name]["min"]) for h, b in zip(head, base)]
+        ratios = [h / b if b else float("inf") for h, b in pairs]
+        ratio, p_value = statistics.median(ratios), sign_test(ratios)
+        regression = ratio > 1.0 + min_slowdown and p_value < alpha
+        comparison[name] = {"base": statistics.median(b for _, b in pairs),
+                            "head": statistics.median(h for h, _ in pairs),
+                            "ratios": ratios, "median_ratio": ratio, "p_value": p_value, "regression": regression}
+        slower = sum(1 for r in ratios if r > 1.0)
+        print(f"{name:<34}{comparison[name]['base']:>12.6f}{comparison[name]['head']:>12.6f}{ratio:>8.2f}"
+              f"{f'{slower}/{len(ratios)}':>8}{p_value:>8.3f}{'  ❌' if regression else ''}")
+    return comparison
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmarks for gmxauto's orchestration hot paths")
+    parser.add_argument("--output", default="bench_output.json", help="machine-readable results file")
+    parser.add_argument("--base", default="HEAD", help="git ref the working tree is compared against")
+    parser.add_argument("--rounds", type=int, default=12, help="paired head/base suite runs")
+    parser.add_argument("--min-slowdown", type=float, default=0.10,
+                        help="smallest median slowdown reported as a regression (0.10 = 10%%)")
+    parser.add_argument("--alpha", type=float, default=0.05,
+                        help="significance level of the sign test, shared by all benchmarks")
+    parser.add_argument("--measure-only", action="store_true", help="time this tree once, without a comparison")
+    parser.add_argument("--max-lines", type=int, default=10 ** 5, help="largest synthetic mdrun output (up to 10^7)")
+    parser.add_argument("--repeat", type=int, default=3, help="timed samples per benchmark and run")
+    parser.add_argument("--log-messages", type=int, default=10000)
+    args = parser.parse_args()
+
+    meta = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+    }
+    if args.measure_only:
+        logging.disable(logging.CRITICAL)
+        try:
+            results = run_suite(args)
+        finally:
+            logging.disable(logging.NOTSET)
+        with open(args.output, "w") as f:
+            json.dump({"meta": meta, "results": results}, f, indent=2)
+        print(f"\n💾 Results written to {args.output}")
+        return 0
+
+    scratch = tempfile.mkdtemp(prefix="gmxauto_bench_trees_")
+    try:
+        # Both trees are run from copies side by side, so neither gains from where it is stored
+        trees = {"head": os.path.join(scratch, "head"), "base": os.path.join(scratch, "base")}
+        shutil.copytree(ROOT, trees["head"], ignore=shutil.ignore_patterns(".git", "__pycache__"))
+        export_tree(args.base, trees["base"])
+        runs = {"head": [], "base": []}
+        for round_ in range(args.rounds):
+            # Alternate which tree goes first, so neither always runs on a warmer machine
+            order = ("head", "base") if round_ % 2 == 0 else ("base", "head")
+            print(f"🔁 Round {round_ + 1}/{args.rounds}: {order[0]}, then {order[1]}")
+            for name in order:
+                runs[name].append(run_tree(trees[name], args, os.path.join(scratch, f"{name}.json")))
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    comparison = compare(runs["head"], runs["base"], args.min_slowdown, args.alpha)
+    meta.update(base=args.base, rounds=args.rounds, min_slowdown=args.min_slowdown, alpha=args.alpha)
+    with open(args.output, "w") as f:
+        json.dump({"meta": meta, "comparison": comparison, "head": runs["head"], "base": runs["base"]}, f, indent=2)
+    print(f"\n💾 Results written to {args.output}")
+
+    regressions = [name for name, entry in comparison.items() if entry["regression"]]
+    if regressions:
+        print(f"\n❌ Performance regressions against {args.base}: {', '.join(regressions)}")
+        return 1
+    print(f"\n✅ No performance regressions against {args.base}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,259 @@
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import logging
+import argparse
+import tempfile
+import threading
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from PyQt6.QtCore import QCoreApplication
+
+from job_scheduler import PriorityScheduler, SimulationJob
+from process_backend import ProcessBackend
+from status_store import StatusStore
+
+FAKE_GMX = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_gmx")
+
+MINIMIZATION_MDP = """define                  = -DREST_ON -DSTEP4_0
+integrator              = steep
+emtol                   = 1000.0
+nsteps                  = 5000
+nstlist                 = 10
+cutoff-scheme           = Verlet
+coulombtype             = PME
+rcoulomb                = 1.2
+"""
+
+EQUILIBRATION_MDP = """define                  = -DREST_ON -DSTEP4_1
+integrator              = md
+dt                      = 0.001
+nsteps                  = 125000
+nstxout-compressed      = 5000
+nstcalcenergy           = 100
+nstenergy               = 1000
+nstlog                  = 1000
+cutoff-scheme           = Verlet
+nstlist                 = 20
+tcoupl                  = v-rescale
+tc_grps                 = SOLU SOLV
+tau_t                   = 1.0 1.0
+ref_t                   = 303.15 303.15
+constraints             = h-bonds
+"""
+
+PRODUCTION_MDP = """integrator              = md
+dt                      = 0.002
+nsteps                  = 500000
+nstxout-compressed      = 5000
+compressed-x-grps       = System
+nstcalcenergy           = 100
+nstenergy               = 1000
+nstlog                  = 1000
+cutoff-scheme           = Verlet
+nstlist                 = 20
+tcoupl                  = v-rescale
+tc_grps                 = SOLU SOLV
+tau_t                   = 1.0 1.0
+ref_t                   = 303.15 303.15
+pcoupl                  = C-rescale
+constraints             = h-bonds
+continuation            = yes
+"""
+
+
+def make_system(folder: str, atoms: int, solute_fraction: float = 0.1) -> None:
+    os.makedirs(folder, exist_ok=True)
+    solute = max(int(atoms * solute_fraction), 1)
+    lines = ["Synthetic system for the gmxauto load test", f"{atoms:5d}"]
+    for i in range(atoms):
+        residue = "PROT" if i < solute else "TIP3"
+        lines.append(f"{i // 3 % 100000:5d}{residue:<5}{'CA':>5}{i % 100000:5d}"
+                     f"{(i % 50) * 0.1:8.3f}{(i // 50 % 50) * 0.1:8.3f}{(i // 2500) * 0.1:8.3f}")
+    lines.append("   5.00000   5.00000   5.00000")
+    with open(os.path.join(folder, "step3_input.gro"), "w") as f:
+        f.write("\n".join(lines) + "\n")
+    with open(os.path.join(folder, "topol.top"), "w") as f:
+        f.write("[ system ]\nSynthetic\n\n[ molecules ]\nPROT 1\nTIP3 1\n")
+    with open(os.path.join(folder, "index.ndx"), "w") as f:
+        for name, first, last in (("System", 1, atoms), ("SOLU", 1, solute), ("SOLV", solute + 1, atoms)):
+            f.write(f"[ {name} ]\n")
+            numbers = list(range(first, last + 1))
+            for i in range(0, len(numbers), 15):
+                f.write(" ".join(f"{n:>5}" for n in numbers[i:i + 15]) + "\n")
+    for name, content in (("step4.0_minimization.mdp", MINIMIZATION_MDP),
+                          ("step4.1_equilibration.mdp", EQUILIBRATION_MDP),
+                          ("step5_production.mdp", PRODUCTION_MDP)):
+        with open(os.path.join(folder, name), "w") as f:
+            f.write(content)
+
+
+def percentiles(values) -> dict:
+    if not values:
+        return {"count": 0}
+    ordered = sorted(values)
+    pick = lambda q: ordered[min(int(q * (len(ordered) - 1) + 0.5), len(ordered) - 1)]
+    return {"count": len(ordered), "mean": sum(ordered) / len(ordered),
+            "p50": pick(0.5), "p95": pick(0.95), "max": ordered[-1]}
+
+
+def read_trace(folder: str) -> list:
+    path = os.path.join(folder, "fake_gmx_trace.jsonl")
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return sorted((json.loads(line) for line in f if line.strip()), key=lambda r: r["start"])
+
+
+def peak_rss_mb() -> float:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run many simulated jobs through gmxauto against a fake gmx")
+    parser.add_argument("--jobs", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=0, help="jobs running at once (default: all)")
+    parser.add_argument("--atoms", type=int, default=10000)
+    parser.add_argument("--duration", type=float, default=1.0, help="production length in ns")
+    parser.add_argument("--steps-per-second", type=float, default=500000.0)
+    parser.add_argument("--progress-interval", type=float, default=0.2)
+    parser.add_argument("--crash-fraction", type=float, default=0.0, help="fraction of jobs whose production crashes")
+    parser.add_argument("--hang-fraction", type=float, default=0.0, help="fraction of jobs whose production hangs")
+    parser.add_argument("--no-trajectories", action="store_true", help="skip writing .xtc/.trr/.edr frames")
+    parser.add_argument("--plain-backend", action="store_true",
+                        help="use the minimal ProcessBackend instead of the platform backend")
+    parser.add_argument("--timeout", type=float, default=900.0, help="cancel jobs still running after this many seconds")
+    parser.add_argument("--workdir", help="folder for the job directories (default: a temporary folder)")
+    parser.add_argument("--keep", action="store_true", help="keep the job directories afterwards")
+    parser.add_argument("--output", default="load_test.json")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s [%(levelname)s] %(name)s: %(message)s")
+    rng = random.Random(args.seed)
+    base = args.workdir or tempfile.mkdtemp(prefix="gmxauto_load_")
+    concurrency = args.concurrency or args.jobs
+
+    os.environ["FAKE_GMX_STEPS_PER_SECOND"] = str(args.steps_per_second)
+    os.environ["FAKE_GMX_PROGRESS_INTERVAL"] = str(args.progress_interval)
+    os.environ["FAKE_GMX_WRITE_TRAJECTORIES"] = "0" if args.no_trajectories else "1"
+    os.environ["FAKE_GMX_TRACE"] = "1"
+
+    print(f"🧪 Preparing {args.jobs} synthetic systems ({args.atoms} atoms) in {base}")
+    folders = []
+    template = os.path.join(base, "template")
+    make_system(template, args.atoms)
+    for i in range(args.jobs):
+        folder = os.path.join(base, f"job_{i:04d}")
+        shutil.copytree(template, folder)
+        cues = {}
+        draw = rng.random()
+        if draw < args.crash_fraction:
+            cues["crash"] = f"step5_1@{rng.uniform(0.1, 0.9):.2f}"
+        elif draw < args.crash_fraction + args.hang_fraction:
+            cues["hang"] = f"step5_1@{rng.uniform(0.1, 0.9):.2f}"
+        if cues:
+            with open(os.path.join(folder, "fake_gmx.json"), "w") as f:
+                json.dump(cues, f)
+        folders.append(folder)
+
+    app = QCoreApplication.instance() or QCoreApplication(sys.argv)
+    store = StatusStore()
+    backend_factory = (lambda job: ProcessBackend()) if args.plain_backend else None
+    scheduler = PriorityScheduler(gpu_devices=[], max_cpu_jobs=concurrency,
+                                  backend_factory=backend_factory, status_store=store)
+
+    staleness = []
+    done = threading.Event()
+
+    def sample():
+        # How old the freshest status of each running job is, i.e. what a dashboard would lag behind
+        while not done.wait(0.5):
+            now = time.time()
+            _, records = store.changed_since(0)
+            staleness.extend(now - r["updated"] for r in records if r["state"] == "running")
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    cpu_before = os.times()
+    started = time.time()
+    sampler.start()
+    jobs = [scheduler.submit(SimulationJob(folder, 0, 1, args.duration, "ns", "CPU", name=os.path.basename(folder),
+                                           gmx_folder=FAKE_GMX))
+            for folder in folders]
+
+    final_states = ("finished", "failed", "cancelled")
+    cancelled = False
+    while not all(job.status in final_states for job in jobs):
+        app.processEvents()
+        time.sleep(0.05)
+        if not cancelled and time.time() - started > args.timeout:
+            print(f"⏱️ Timeout after {args.timeout:.0f}s, cancelling remaining jobs")
+            for job in jobs:
+                scheduler.cancel(job)
+            cancelled = True
+    wall = time.time() - started
+    done.set()
+    sampler.join()
+    cpu_after = os.times()
+    scheduler.threadpool.waitForDone()
+
+    overheads, gaps, invocations = [], [], 0
+    for job in jobs:
+        trace = read_trace(job.workdir)
+        invocations += len(trace)
+        job_start = next((e["time"] for e in job.history if e["event"] == "started"), None)
+        job_end = next((e["time"] for e in reversed(job.history) if e["event"] in final_states), None)
+        if trace and job_start and job_end and job.status == "finished":
+            overheads.append((job_end - job_start) - sum(r["end"] - r["start"] for r in trace))
+        gaps.extend(b["start"] - a["end"] for a, b in zip(trace, trace[1:]))
+
+    counts = {}
+    for job in jobs:
+        counts[job.status] = counts.get(job.status, 0) + 1
+    driver_cpu = (cpu_after.user - cpu_before.user) + (cpu_after.system - cpu_before.system)
+    report = {
+        "config": vars(args),
+        "jobs": counts,
+        "wall_seconds": wall,
+        "jobs_per_minute": len(jobs) / wall * 60,
+        "gmx_invocations": invocations,
+        "job_overhead_seconds": percentiles(overheads),
+        "step_gap_seconds": percentiles(gaps),
+        "status_staleness_seconds": percentiles(staleness),
+        "driver_cpu_seconds": driver_cpu,
+        "driver_cpu_per_job_seconds": driver_cpu / len(jobs) if jobs else 0.0,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"🏁 {counts} in {wall:.1f}s ({report['jobs_per_minute']:.1f} jobs/min, {invocations} gmx calls)")
+    for key in ("job_overhead_seconds", "step_gap_seconds", "status_staleness_seconds"):
+        stats = report[key]
+        if stats["count"]:
+            print(f"   {key:<26} p50 {stats['p50']:.3f}  p95 {stats['p95']:.3f}  max {stats['max']:.3f}")
+    print(f"   driver CPU {driver_cpu:.1f}s ({report['driver_cpu_per_job_seconds'] * 1000:.1f} ms/job), "
+          f"peak RSS {report['peak_rss_mb'] or 0:.0f} MB")
+    print(f"💾 Report written to {args.output}")
+
+    if not args.keep and not args.workdir:
+        shutil.rmtree(base, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,351 @@
+import os
+import sys
+import json
+import errno
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+import traceback
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+FAKE_GMX = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_gmx")
+
+from mdp_file_manager import MDPFileManager
+from topology_processor import TopologyProcessor
+
+TOPOLOGY = """[ defaults ]
+1 2 yes 1.0 1.0
+
+[ atomtypes ]
+CT3   6  12.011  -0.27  A  0.3670  0.3265
+HA3   1   1.008   0.09  A  0.2388  0.1004
+OT    8  15.9994 -0.834 A  0.3151  0.6364
+HT    1   1.008   0.417 A  0.0400  0.1925
+
+[ moleculetype ]
+MET  3
+
+[ atoms ]
+    1  CT3  1  MET  C1  1  -0.27  12.011
+    2  HA3  1  MET  H1  1   0.09
+    3  HA3  1  MET  H2  1   0.09
+    4  HA3  1  MET  H3  1   0.09   1.008   ; explicit mass
+
+[ bonds ]
+1 2 1
+1 3 1
+1 4 1
+
+[ moleculetype ]
+TIP3  2
+
+[ atoms ]
+    1  OT  1  TIP3  OH2  1  -0.834  15.9994
+    2  HT  1  TIP3  H1   1   0.417   1.008
+    3  HT  1  TIP3  H2   1   0.417   1.008
+
+[ bonds ]
+1 2 1
+1 3 1
+
+[ system ]
+Self check
+
+[ molecules ]
+MET   1
+TIP3  10
+"""
+
+
+def check_hmr_masses(workdir: str) -> None:
+    top = os.path.join(workdir, "topol.top")
+    with open(top, "w") as f:
+        f.write(TOPOLOGY)
+    hmr = TopologyProcessor.repartition(top, 3.0)
+    molecules = TopologyProcessor.molecule_masses(hmr)
+    methyl = {nr: atom["mass"] for nr, atom in molecules["MET"]["atoms"].items()}
+    water = {nr: atom["mass"] for nr, atom in molecules["TIP3"]["atoms"].items()}
+    assert all(abs(methyl[h] - 3.024) < 1e-4 for h in (2, 3, 4)), methyl
+    assert abs(methyl[1] - (12.011 - 3 * 2.016)) < 1e-4, methyl
+    assert water == {1: 15.9994, 2: 1.008, 3: 1.008}, water
+
+    # The verification must reject a topology whose hydrogens were not scaled
+    with open(hmr) as f:
+        text = f.read()
+    with open(hmr, "w") as f:
+        f.write(text.replace("3.02400", "2.02400", 1))
+    try:
+        TopologyProcessor.verify(top, hmr, 3.0)
+    except ValueError:
+        return
+    raise AssertionError("verify() accepted a wrongly repartitioned topology")
+
+
+def check_hmr_output_intervals(workdir: str) -> None:
+    from simulation_worker import SimulationWorker
+    mdp = os.path.join(workdir, "step5_production.mdp")
+    with open(mdp, "w") as f:
+        f.write("dt = 0.002\nnstxout-compressed = 5000\nnstcalcenergy = 100\nnstenergy = 1000\nnstlog = 1000\n"
+                "nstxout = 0\n")
+    worker = SimulationWorker(workdir, 0, 1, 1, "ns", "CPU", hmr_timestep=0.004)
+    worker.rescale_output_intervals(mdp, 0.002 / 0.004)
+    values = {key: MDPFileManager.read_parameter(mdp, key)
+              for key in ("nstxout-compressed", "nstcalcenergy", "nstenergy", "nstlog", "nstxout")}
+    assert values == {"nstxout-compressed": "2500", "nstcalcenergy": "50", "nstenergy": "500",
+                      "nstlog": "500", "nstxout": "0"}, values
+
+
+def _mpi_launch(workdir: str, device_ids: list, **options) -> list:
+    from load_test import make_system
+    from mpi_backend import MPIProcessBackend
+    from environment_manager import EnvironmentManager
+    make_system(workdir, 300)
+    env = EnvironmentManager(len(device_ids), "CUDA", device_ids, FAKE_GMX).build_env()
+    env["FAKE_GMX_STARTUP_DELAY"] = "0"
+    backend = MPIProcessBackend("openmpi", launcher_path=os.path.join(FAKE_GMX, "bin", "mpirun"), **options)
+    try:
+        backend.run("gmx grompp -f step5_production.mdp -c step3_input.gro -p topol.top -n index.ndx -o step5_1.tpr",
+                    cwd=workdir, env=env)
+        process = backend.popen("gmx mdrun -deffnm step5_1 -nsteps 2000 -ntmpi 2 -ntomp 4 -gpu_id 0,1 "
+                                "-pin on -pinoffset 0 -pinstride 1", cwd=workdir, env=env,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        assert backend.wait(process) == 0, f"mpirun exited with {process.returncode}"
+    finally:
+        backend.close()
+    assert os.path.exists(os.path.join(workdir, "step5_1.gro")), "rank 0 wrote no final coordinates"
+    with open(os.path.join(workdir, "fake_mpi_trace.jsonl")) as f:
+        return [json.loads(line) for line in f]
+
+
+def check_mpi_multi_node(workdir: str) -> None:
+    trace = _mpi_launch(workdir, [2, 3], hosts=["node01", "node02"], gpus_per_node=2, cores_per_node=8)
+    launch, ranks = trace[0], sorted(trace[1:], key=lambda r: r["rank"])
+    assert launch["np"] == 4 and launch["map_by"] == "ppr:2:node:PE=4", launch
+    assert "CUDA_VISIBLE_DEVICES" not in launch["export"], launch["export"]
+    assert [r["host"] for r in ranks] == ["node01", "node01", "node02", "node02"], ranks
+    for rank in ranks:
+        args, env = rank["argv"], rank["env"]
+        assert args[args.index("-ntomp") + 1] == "4" and args[args.index("-gpu_id") + 1] == "0,1", args
+        assert "-ntmpi" not in args and args[args.index("-pin") + 1] == "off", args
+        assert env["PATH"].split(os.pathsep)[0] == os.path.join(FAKE_GMX, "bin"), env["PATH"]
+        assert env.get("GMXDATA") and env.get("GMX_ENABLE_DIRECT_GPU_COMM") == "true", env
+        assert "CUDA_VISIBLE_DEVICES" not in env, env
+
+
+def check_mpi_single_node(workdir: str) -> None:
+    trace = _mpi_launch(workdir, [2, 3], gpus_per_node=2, cores_per_node=4)
+    ranks = [r for r in trace if r.get("binary") == "gmx_mpi"]
+    assert len(ranks) == 2 and all(r["env"].get("CUDA_VISIBLE_DEVICES") == "2,3" for r in ranks), ranks
+    try:
+        _mpi_launch(os.path.join(workdir, "mismatch"), [2, 3], gpus_per_node=4, cores_per_node=4)
+    except ValueError:
+        return
+    raise AssertionError("two assigned GPUs were accepted for gpus_per_node = 4")
+
+
+
+def check_mpi_checkpoint_request(workdir: str) -> None:
+    from load_test import make_system
+    from mpi_backend import MPIProcessBackend
+    from environment_manager import EnvironmentManager
+    assert not MPIProcessBackend("mpich").can_request_checkpoint
+    assert not MPIProcessBackend("srun").can_request_checkpoint
+    make_system(workdir, 300)
+    env = EnvironmentManager(1, "CUDA", [0], FAKE_GMX).build_env()
+    # mdrun only notices the signal every 3 s, longer than Open MPI's default 1 s SIGKILL delay
+    env.update(FAKE_GMX_STARTUP_DELAY="0", FAKE_GMX_PROGRESS_INTERVAL="3", FAKE_GMX_STEPS_PER_SECOND="100")
+    backend = MPIProcessBackend("openmpi", launcher_path=os.path.join(FAKE_GMX, "bin", "mpirun"), gpus_per_node=1)
+    assert backend.can_request_checkpoint
+    try:
+        backend.run("gmx grompp -f step5_production.mdp -c step3_input.gro -p topol.top -n index.ndx -o step5_1.tpr",
+                    cwd=workdir, env=env)
+        process = backend.popen("gmx mdrun -deffnm step5_1 -nsteps 100000", cwd=workdir, env=env,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        time.sleep(1.0)
+        backend.request_checkpoint(process)
+        code = backend.wait(process)
+    finally:
+        backend.close()
+    assert code == 0, f"mpirun exited with {code}, the ranks were killed before mdrun checkpointed"
+    assert os.path.exists(os.path.join(workdir, "step5_1.cpt")), "no checkpoint written"
+
+def check_scratch_stage_in_failure(workdir: str) -> None:
+    from scratch_stager import ScratchStager
+    from simulation_worker import SimulationWorker
+    folder, scratch = os.path.join(workdir, "job"), os.path.join(workdir, "scratch")
+    os.makedirs(folder)
+    originals = {"a.gro": b"a" * 1000, "b.top": b"b" * 100000, "c.mdp": b"c" * 500}
+    for name, data in originals.items():
+        with open(os.path.join(folder, name), "wb") as f:
+            f.write(data)
+
+    def copy_file(src, dst, **kwargs):
+        # Scratch fills up in the middle of b.top
+        if os.path.basename(src) == "b.top":
+            with open(dst, "wb") as f:
+                f.write(originals["b.top"][:10])
+            raise OSError(errno.ENOSPC, "No space left on device", dst)
+        return shutil.copy2(src, dst, **kwargs)
+
+    saved = ScratchStager.copy_file
+    ScratchStager.copy_file = staticmethod(copy_file)
+    try:
+        worker = SimulationWorker(folder, 0, 1, 1, "ns", "CPU", scratch_root=scratch)
+        worker.run()
+    finally:
+        ScratchStager.copy_file = saved
+    assert worker.error and worker.workdir == folder, worker.error
+    for name, data in originals.items():
+        with open(os.path.join(folder, name), "rb") as f:
+            assert f.read() == data, f"{name} was overwritten by a failed stage-in"
+    assert sorted(os.listdir(folder)) == sorted(originals), os.listdir(folder)
+    assert not os.listdir(scratch), f"scratch copy left behind: {os.listdir(scratch)}"
+
+
+def check_preempt_reserves_devices(workdir: str) -> None:
+    # Two 1-GPU low-priority jobs fill both GPUs; an urgent 2-GPU job must get both of them
+    # before either parked job is resumed on the first GPU that frees up
+    from PyQt6.QtCore import QCoreApplication
+    from load_test import make_system
+    from job_scheduler import PriorityScheduler, SimulationJob
+    app = QCoreApplication.instance() or QCoreApplication(sys.argv)
+    saved = {key: os.environ.get(key) for key in ("FAKE_GMX_STEPS_PER_SECOND", "FAKE_GMX_PROGRESS_INTERVAL")}
+    os.environ.update(FAKE_GMX_STEPS_PER_SECOND="500000", FAKE_GMX_PROGRESS_INTERVAL="0.1")
+    try:
+        folders = {}
+        for name in ("low1", "low2", "urgent"):
+            folders[name] = os.path.join(workdir, name)
+            make_system(folders[name], 300)
+        scheduler = PriorityScheduler(gpu_devices=[0, 1])
+        low = [scheduler.submit(SimulationJob(folders[name], 1, 1, 4, "ns", "CUDA", priority=0, name=name,
+                                              gmx_folder=FAKE_GMX)) for name in ("low1", "low2")]
+        deadline = time.time() + 60
+        while not all(job.worker and job.worker.preemptible for job in low):
+            assert time.time() < deadline, "low-priority jobs never reached production"
+            app.processEvents()
+            time.sleep(0.02)
+        urgent = scheduler.submit(SimulationJob(folders["urgent"], 2, 1, 0.5, "ns", "CUDA", priority=10,
+                                                name="urgent", gmx_folder=FAKE_GMX))
+        jobs = low + [urgent]
+        deadline = time.time() + 120
+        while not all(job.status in ("finished", "failed", "cancelled") for job in jobs):
+            assert time.time() < deadline, {job.name: job.status for job in jobs}
+            app.processEvents()
+            time.sleep(0.02)
+        scheduler.threadpool.waitForDone()
+    finally:
+        for key, value in saved.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+    assert all(job.status == "finished" for job in jobs), {job.name: (job.status, job.history[-1]) for job in jobs}
+    started = next(e["time"] for e in urgent.history if e["event"] == "started")
+    for job in low:
+        events = [e["event"] for e in job.history]
+        assert "parked" in events, events
+        resumed = next(e["time"] for e in job.history if e["event"] == "resumed")
+        assert resumed >= started, f"{job.name} resumed {started - resumed:.1f}s before the urgent job started"
+
+
+def check_convergence_short_equilibration(workdir: str) -> None:
+    import math
+    import random
+    from convergence_monitor import ConvergenceMonitor
+    # The CHARMM-GUI step4.1 default: 125000 steps of 1 fs, energies logged every ps
+    mdp, log = os.path.join(workdir, "step4.1_equilibration.mdp"), os.path.join(workdir, "step4.1_equilibration.log")
+    with open(mdp, "w") as f:
+        f.write("integrator = md\ndt = 0.001\nnsteps = 125000\nnstlog = 1000\n")
+    monitor = ConvergenceMonitor.for_mdp(log, mdp, check_interval=0)
+    assert monitor.min_time_ps < 125.0 and monitor.window_ps < 125.0, (monitor.min_time_ps, monitor.window_ps)
+
+    rng = random.Random(7)
+    converged_at = None
+    with open(log, "w") as f:
+        for step in range(0, 125001, 1000):
+            t = step * 0.001
+            relax = math.exp(-t / 10.0)
+            terms = [("Temperature", 303.15 - 30.0 * relax + rng.gauss(0, 1.0)),
+                     ("Pressure (bar)", -200.0 * relax + rng.gauss(0, 30.0)),
+                     ("Density", 1010.0 - 25.0 * relax + rng.gauss(0, 0.5))]
+            f.write(f"{'Step':>15}{'Time':>15}\n{step:>15}{t:>15.5f}\n\n   Energies (kJ/mol)\n")
+            f.write("".join(f"{name:>15}" for name, _ in terms) + "\n")
+            f.write("".join(f"{value:15.5e}" for _, value in terms) + "\n\n")
+            f.flush()
+            if monitor.converged():
+                converged_at = monitor.converged_at
+                break
+    assert converged_at is not None, f"a 125 ps equilibration never converged: {monitor.report}"
+    assert monitor.min_time_ps <= converged_at < 125.0, converged_at
+
+
+def check_agent_upload_untimed(workdir: str) -> None:
+    from status_store import StatusStore
+    store = StatusStore()
+    store.register("job", "job")
+    store.update("job", state="queued", stage="Uploading")
+    time.sleep(0.05)
+    store.update("job", state="running", stage="Step 1: Preprocessing Minimization")
+    store.update("job", state="finished")
+    assert "Uploading" not in store.stage_durations, sorted(store.stage_durations)
+    assert "Step 1: Preprocessing Minimization" in store.stage_durations, sorted(store.stage_durations)
+
+
+def check_agent_capacity_probe_timeout(workdir: str) -> None:
+    import socket
+    from agent_controller import AgentClient, AgentController
+
+    class IdleAgent(AgentClient):
+        def info(self, timeout: float = None) -> dict:
+            return {"free_gpus": 2, "gpus": [0, 1], "free_cpu_slots": 1, "running": 0}
+
+    # Accepts the connection but never answers, like an agent stuck behind a hung filesystem
+    hung = socket.socket()
+    hung.bind(("127.0.0.1", 0))
+    hung.listen(1)
+    try:
+        controller = AgentController([f"http://127.0.0.1:{hung.getsockname()[1]}", IdleAgent("http://idle")],
+                                     probe_timeout=0.5)
+        started = time.time()
+        capacity = controller._capacity()
+        elapsed = time.time() - started
+    finally:
+        hung.close()
+    assert list(capacity) == ["http://idle"], list(capacity)
+    assert elapsed < 5.0, f"capacity probe blocked for {elapsed:.1f}s on a hung agent"
+
+
+CHECKS = [check_hmr_masses, check_hmr_output_intervals, check_mpi_multi_node, check_mpi_single_node,
+          check_mpi_checkpoint_request, check_scratch_stage_in_failure, check_preempt_reserves_devices,
+          check_convergence_short_equilibration, check_agent_upload_untimed, check_agent_capacity_probe_timeout]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quick correctness checks that run without GROMACS")
+    parser.add_argument("names", nargs="*", help="checks to run (default: all)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s [%(levelname)s] %(name)s: %(message)s")
+    failed = 0
+    for check in CHECKS:
+        if args.names and check.__name__ not in args.names:
+            continue
+        workdir = tempfile.mkdtemp(prefix="gmxauto_check_")
+        try:
+            check(workdir)
+            print(f"✅ {check.__name__}")
+        except Exception:
+            failed += 1
+            print(f"❌ {check.__name__}\n{traceback.format_exc()}")
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,34 +1,67 @@
+import os
 import subprocess
 import shlex
 import time
 import re
 import logging
 from mdp_file_manager import MDPFileManager
+from process_backend import ProcessBackend
+
+class SimulationPreempted(RuntimeError):
+    pass
 
 class CommandRunner:
     logger = logging.getLogger("CommandRunner")
 
+    POLL_INTERVAL = 0.3  # seconds between polls of a running mdrun
+
     @staticmethod
-    def run_command(command: str):
+    def run_command(command: str, backend: ProcessBackend = None, cwd: str = None, env: dict = None):
         CommandRunner.logger.debug(f"💻 Running command: {command}")
-        result = subprocess.run(command, shell=True, check=True, text=True,
-                                stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        return result
+        backend = backend or ProcessBackend.create()
+        return backend.run(command, cwd=cwd, env=env)
+
+    @staticmethod
+    def parse_progress(data: str, minimization: bool = False):
+        for line in data.splitlines():
+            if "step" in line.lower():
+                if minimization:
+                    match = re.search(r"(?<!\S)step=\s*(\d+)", line, re.IGNORECASE)
+                else:
+                    match = re.search(r"(?<!\S)(steps?\s*=\s*|step\s*)(\d+)", line, re.IGNORECASE)
+
+                if match:
+                    yield int(match.group(1) if minimization else match.group(2))
+
+    @staticmethod
+    def _checkpoint_and_exit(process, step_name: str, backend: ProcessBackend, timeout: float):
+        backend.request_checkpoint(process)
+        deadline = time.time() + timeout
+        while backend.poll(process) is None and time.time() < deadline:
+            time.sleep(0.3)
+        if backend.poll(process) is None:
+            CommandRunner.logger.warning(f"⚠️ {step_name} did not exit after checkpoint request, terminating")
+            process.kill()
+            process.wait()
 
     @staticmethod
-    def run_mdrun_with_progress(command: str, step_name: str, update_progress_callback, update_log_callback, check_interrupted_callback=None):
+    def run_mdrun_with_progress(command: str, step_name: str, update_progress_callback, update_log_callback, check_interrupted_callback=None, backend: ProcessBackend = None,
+                                cwd: str = None, env: dict = None, check_preempt_callback=None, preempt_timeout: float = 300,
+                                check_stop_callback=None, update_status_callback=None, total_nsteps: int = None):
+        backend = backend or ProcessBackend.create()
+        command = backend.adjust_command(command)
         CommandRunner.logger.debug(f"🚀 Running mdrun with progress: {command}")
         safe_name = step_name.replace(" ", "_").replace(":", "")
         log_file = f"progress_{safe_name}.log"
-        output_file = f"output_{safe_name}.txt"
+        output_file = os.path.join(cwd or "", f"output_{safe_name}.txt")
         
-        total_nsteps = None
-        if "step4.0" in command:
-            total_nsteps = MDPFileManager.read_nsteps("step4.0_minimization.mdp")
-        elif "step4.1" in command:
-            total_nsteps = MDPFileManager.read_nsteps("step4.1_equilibration.mdp")
-        elif "step5_1" in command or "step5_production" in command:
-            total_nsteps = MDPFileManager.read_nsteps("step5_production.mdp")
+        if not total_nsteps:
+            if "step4.0" in command:
+                total_nsteps = MDPFileManager.read_nsteps(os.path.join(cwd or "", "step4.0_minimization.mdp"))
+            elif "step4.1" in command:
+                total_nsteps = MDPFileManager.read_nsteps(os.path.join(cwd or "", "step4.1_equilibration.mdp"))
+            elif "step5_1" in command or "step5_production" in command:
+                total_nsteps = MDPFileManager.read_nsteps(os.path.join(cwd or "", "step5_production.mdp"))
         
         if not total_nsteps:
             raise RuntimeError(f"❌ nsteps not found for {step_name}")
@@ -45,46 +78,55 @@ class CommandRunner:
             command = f"{command} -g {log_file}"
 
         with open(output_file, 'w') as f:
-            process = subprocess.Popen(
+            process = backend.popen(
                 shlex.split(command),
                 stdout=f,
                 stderr=subprocess.STDOUT,
                 universal_newlines=True,
                 shell=False,
-                creationflags=subprocess.CREATE_NO_WINDOW
+                cwd=cwd,
+                env=env
             )
         
         current = 0
         last_step = 0
-        while process.poll() is None:
+        while backend.poll(process) is None:
             if check_interrupted_callback and check_interrupted_callback():
                 process.terminate()
+                process.wait()
+                backend.release(process)
                 CommandRunner.logger.info(f"⚠️ Process {step_name} terminated by user.")
                 raise RuntimeError(f"Simulation {step_name} terminated by user.")
 
-            with open(output_file, 'r') as f_read:
-                data = f_read.read()
-                for line in data.splitlines():
-                    if "step" in line.lower():
-                        if "step4.0" in command:
-                            match = re.search(r"(?<!\S)step=\s*(\d+)", line, re.IGNORECASE)
-                        else:
-                            match = re.search(r"(?<!\S)(steps?\s*=\s*|step\s*)(\d+)", line, re.IGNORECASE)
+            if check_preempt_callback and check_preempt_callback():
+                CommandRunner.logger.info(f"⏸️ Preempting {step_name}, waiting for checkpoint...")
+                CommandRunner._checkpoint_and_exit(process, step_name, backend, preempt_timeout)
+                backend.release(process)
+                raise SimulationPreempted(f"Simulation {step_name} preempted at step {current}.")
 
-                        if match:
-                            step_val = int(match.group(1) if "step4.0" in command else match.group(2))
-                            if step_val >= last_step:
-                                current = step_val
-                                last_step = step_val
+            if check_stop_callback and check_stop_callback():
+                CommandRunner.logger.info(f"⏹️ Ending {step_name} early at step {current}, waiting for checkpoint...")
+                CommandRunner._checkpoint_and_exit(process, step_name, backend, preempt_timeout)
+                break
 
-                                progress_percent = min((current / total_nsteps) * 100, 99.9)
-                                update_progress_callback(progress_percent)
-                                CommandRunner.logger.info(
-                                    f"⏳ {step_name} | Step {current}/{total_nsteps} | Progress: {progress_percent:.2f}%"
-                                )
+            with open(output_file, 'r') as f_read:
+                data = f_read.read()
+                for step_val in CommandRunner.parse_progress(data, "step4.0" in command):
+                    current = max(current, step_val)
+                # Only report when the step count actually moved
+                if current > last_step:
+                    last_step = current
+                    progress_percent = min((current / total_nsteps) * 100, 99.9)
+                    update_progress_callback(progress_percent)
+                    CommandRunner.logger.info(
+                        f"⏳ {step_name} | Step {current}/{total_nsteps} | Progress: {progress_percent:.2f}%"
+                    )
+            if update_status_callback:
+                update_status_callback(current, total_nsteps)
             update_log_callback()
-            time.sleep(0.3)
+            time.sleep(CommandRunner.POLL_INTERVAL)
 
+        backend.release(process)
         update_progress_callback(100)
         if process.returncode != 0:
             raise subprocess.CalledProcessError(process.returncode, command)
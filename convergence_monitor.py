@@ -0,0 +1,210 @@
+import os
+import time
+import logging
+import statistics
+from mdp_file_manager import MDPFileManager
+
+class EnergyLogParser:
+    FIELD_WIDTH = 15
+
+    def __init__(self, log_path: str):
+        self.log_path = log_path
+        self.samples = []
+        self._offset = 0
+        self._buffer = ""
+        self._identity = self._file_identity()
+        self._stale = self._identity is not None  # a log left over from a previous run
+        self._time = None
+        self._names = None
+        self._values = None
+        self._in_energies = False
+        self._expect_step = False
+        self._done = False
+
+    def _file_identity(self):
+        try:
+            st = os.stat(self.log_path)
+        except OSError:
+            return None
+        return (st.st_dev, st.st_ino)
+
+    def _reset(self):
+        self.samples = []
+        self._offset = 0
+        self._buffer = ""
+        self._in_energies = False
+        self._names = None
+        self._done = False
+
+    def update(self) -> int:
+        identity = self._file_identity()
+        if identity is None:
+            return 0
+        if identity != self._identity:
+            # mdrun backed up the old log and started a new one
+            self._identity = identity
+            self._stale = False
+            self._reset()
+        if self._stale or self._done:
+            return 0
+        if os.path.getsize(self.log_path) < self._offset:
+            self._reset()
+
+        with open(self.log_path, 'r', errors='replace') as f:
+            f.seek(self._offset)
+            data = f.read()
+            self._offset = f.tell()
+
+        data = self._buffer + data
+        lines = data.split("\n")
+        self._buffer = lines.pop()
+        before = len(self.samples)
+        for line in lines:
+            self._parse_line(line.rstrip("\r"))
+        return len(self.samples) - before
+
+    def _parse_line(self, line: str) -> None:
+        stripped = line.strip()
+        if "A V E R A G E S" in line:
+            self._done = True
+            return
+        if self._expect_step:
+            self._expect_step = False
+            parts = stripped.split()
+            if len(parts) == 2:
+                try:
+                    self._time = float(parts[1])
+                except ValueError:
+                    pass
+            return
+        if stripped.split() == ["Step", "Time"]:
+            self._expect_step = True
+            return
+        if stripped.startswith("Energies"):
+            self._in_energies = True
+            self._values = {}
+            self._names = None
+            return
+        if not self._in_energies:
+            return
+        if not stripped:
+            if self._values and self._time is not None:
+                self.samples.append((self._time, self._values))
+            self._in_energies = False
+            return
+        if self._names is None:
+            width = self.FIELD_WIDTH
+            self._names = [line[i:i + width].strip() for i in range(0, len(line), width)]
+        else:
+            try:
+                values = [float(v) for v in stripped.split()]
+            except ValueError:
+                values = []
+            self._values.update(zip(self._names, values))
+            self._names = None
+
+
+class ConvergenceMonitor:
+    logger = logging.getLogger("ConvergenceMonitor")
+
+    # drift: allowed change of the linear fit over the window, fluctuation: allowed std of block means
+    DEFAULT_CRITERIA = {
+        "Temperature": {"drift": 1.0, "fluctuation": 0.5},
+        "Pressure": {"drift": 25.0, "fluctuation": 15.0},
+        "Density": {"drift": 0.002, "fluctuation": 0.001, "relative": True},
+        "Volume": {"drift": 0.002, "fluctuation": 0.001, "relative": True},
+    }
+
+    # Without explicit values the window and minimum time are these fractions of the planned run (nsteps * dt),
+    # so a 125 ps CHARMM-GUI equilibration can stop after 50 ps. The fixed values apply if the length is unknown
+    WINDOW_FRACTION = 0.4
+    MIN_TIME_FRACTION = 0.4
+    WINDOW_PS = 100.0
+    MIN_TIME_PS = 200.0
+
+    def __init__(self, log_path: str, criteria: dict = None, window_ps: float = None,
+                 blocks: int = 5, min_time_ps: float = None, check_interval: float = 5.0, run_ps: float = None):
+        self.parser = EnergyLogParser(log_path)
+        self.criteria = criteria or self.DEFAULT_CRITERIA
+        self.run_ps = run_ps
+        if window_ps is None:
+            window_ps = run_ps * self.WINDOW_FRACTION if run_ps else self.WINDOW_PS
+        if min_time_ps is None:
+            min_time_ps = run_ps * self.MIN_TIME_FRACTION if run_ps else self.MIN_TIME_PS
+        if run_ps and min_time_ps >= run_ps:
+            self.logger.warning(f"⚠️ Minimum time {min_time_ps} ps is not shorter than the {run_ps} ps run, "
+                                f"the run will never stop early")
+        self.window_ps = window_ps
+        self.blocks = blocks
+        self.min_time_ps = min_time_ps
+        self.check_interval = check_interval
+        self.report = {}
+        self.converged_at = None
+        self._last_check = 0.0
+
+    @staticmethod
+    def _series(samples, key: str):
+        times, values = [], []
+        for t, sample in samples:
+            name = next((n for n in sample if n.startswith(key)), None)
+            if name is not None:
+                times.append(t)
+                values.append(sample[name])
+        return times, values
+
+    @staticmethod
+    def _slope(times, values) -> float:
+        mean_t = statistics.fmean(times)
+        mean_v = statistics.fmean(values)
+        var_t = sum((t - mean_t) ** 2 for t in times)
+        if var_t == 0:
+            return 0.0
+        return sum((t - mean_t) * (v - mean_v) for t, v in zip(times, values)) / var_t
+
+    def _check_observable(self, key: str, spec: dict, samples):
+        times, values = self._series(samples, key)
+        if len(values) < self.blocks * 2:
+            return None
+        span = times[-1] - times[0]
+        drift = abs(self._slope(times, values) * span)
+        size = len(values) // self.blocks
+        block_means = [statistics.fmean(values[i * size:(i + 1) * size]) for i in range(self.blocks)]
+        fluctuation = statistics.stdev(block_means)
+        if spec.get("relative"):
+            scale = abs(statistics.fmean(values)) or 1.0
+            drift /= scale
+            fluctuation /= scale
+        ok = drift <= spec["drift"] and fluctuation <= spec["fluctuation"]
+        return {"drift": drift, "fluctuation": fluctuation, "converged": ok}
+
+    def converged(self) -> bool:
+        now = time.time()
+        if now - self._last_check < self.check_interval:
+            return False
+        self._last_check = now
+        self.parser.update()
+        samples = self.parser.samples
+        if not samples or samples[-1][0] < self.min_time_ps:
+            return False
+
+        window = [s for s in samples if s[0] >= samples[-1][0] - self.window_ps]
+        report = {}
+        for key, spec in self.criteria.items():
+            result = self._check_observable(key, spec, window)
+            if result is not None:
+                report[key] = result
+        self.report = report
+        if not report or not all(r["converged"] for r in report.values()):
+            return False
+
+        self.converged_at = samples[-1][0]
+        summary = ", ".join(f"{k}: drift {r['drift']:.4g}, block std {r['fluctuation']:.4g}" for k, r in report.items())
+        self.logger.info(f"📉 Converged at t = {samples[-1][0]:.1f} ps ({summary})")
+        return True
+
+    @classmethod
+    def for_mdp(cls, log_path: str, mdp_path: str, **options) -> "ConvergenceMonitor":
+        nsteps = MDPFileManager.read_nsteps(mdp_path)
+        if nsteps and nsteps > 0 and "run_ps" not in options:
+            options["run_ps"] = nsteps * MDPFileManager.extract_dt(mdp_path)
+        return cls(log_path, **options)
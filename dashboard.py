@@ -0,0 +1,205 @@
+import html
+
+from PyQt6.QtWidgets import (
+    QWidget, QVBoxLayout, QHBoxLayout, QTableView, QHeaderView, QLabel,
+    QTextEdit, QStyledItemDelegate, QStyleOptionProgressBar, QApplication, QStyle,
+    QAbstractItemView
+)
+from PyQt6.QtGui import QColor
+from PyQt6.QtCore import Qt, QAbstractTableModel, QModelIndex, QTimer
+
+class JobTableModel(QAbstractTableModel):
+    COLUMNS = ["Job", "State", "Stage", "Progress", "ns/day", "ETA"]
+
+    STATE_COLORS = {
+        "queued": "#9E9E9E",
+        "running": "#2196F3",
+        "preempting": "#FFC107",
+        "parked": "#FF9800",
+        "finished": "#4CAF50",
+        "failed": "#F44336",
+        "cancelled": "#607D8B",
+    }
+
+    def __init__(self, status_store, parent=None):
+        super().__init__(parent)
+        self.status_store = status_store
+        self.rows = []
+        self.row_of = {}
+        self.version = 0
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return len(self.COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
+            return self.COLUMNS[section]
+        return None
+
+    @staticmethod
+    def format_eta(seconds):
+        if seconds is None:
+            return "-"
+        seconds = int(seconds)
+        hours, rest = divmod(seconds, 3600)
+        minutes, seconds = divmod(rest, 60)
+        return f"{hours}h {minutes:02d}m" if hours else f"{minutes}m {seconds:02d}s"
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        record = self.rows[index.row()]
+        column = index.column()
+        if role == Qt.ItemDataRole.DisplayRole:
+            if column == 0:
+                return record["name"]
+            if column == 1:
+                return record["state"]
+            if column == 2:
+                return record["stage"]
+            if column == 3:
+                return record["percent"]
+            if column == 4:
+                return f"{record['ns_per_day']:.1f}" if record["ns_per_day"] else "-"
+            if column == 5:
+                return self.format_eta(record["eta"])
+        if role == Qt.ItemDataRole.ForegroundRole and column == 1:
+            return QColor(self.STATE_COLORS.get(record["state"], "#EEEEEE"))
+        return None
+
+    def job_id(self, row: int):
+        return self.rows[row]["job_id"]
+
+    def refresh(self) -> None:
+        version, changed = self.status_store.changed_since(self.version)
+        self.version = version
+        new_records = []
+        for record in changed:
+            row = self.row_of.get(record["job_id"])
+            if row is None:
+                new_records.append(record)
+                continue
+            self.rows[row] = record
+            self.dataChanged.emit(self.index(row, 0), self.index(row, len(self.COLUMNS) - 1))
+        if new_records:
+            start = len(self.rows)
+            self.beginInsertRows(QModelIndex(), start, start + len(new_records) - 1)
+            for record in new_records:
+                self.row_of[record["job_id"]] = len(self.rows)
+                self.rows.append(record)
+            self.endInsertRows()
+
+
+class ProgressDelegate(QStyledItemDelegate):
+    def paint(self, painter, option, index):
+        option_bar = QStyleOptionProgressBar()
+        option_bar.rect = option.rect.adjusted(2, 3, -2, -3)
+        option_bar.minimum = 0
+        option_bar.maximum = 100
+        percent = index.data() or 0
+        option_bar.progress = int(percent)
+        option_bar.text = f"{percent:.1f}%"
+        option_bar.textVisible = True
+        option_bar.state = QStyle.StateFlag.State_Enabled | QStyle.StateFlag.State_Horizontal
+        QApplication.style().drawControl(QStyle.ControlElement.CE_ProgressBar, option_bar, painter)
+
+
+class JobLogView(QTextEdit):
+    def __init__(self, status_store, job_id, name, parent=None):
+        super().__init__(parent)
+        self.status_store = status_store
+        self.job_id = job_id
+        self.shown = 0
+        self.setWindowTitle(f"Log: {name}")
+        self.setReadOnly(True)
+        self.setAttribute(Qt.WidgetAttribute.WA_DeleteOnClose)
+        self.resize(900, 500)
+        self.setStyleSheet("""
+            background-color: #1e1e1e;
+            font-family: Consolas, monospace;
+            font-size: 12px;
+            color: #CCCCCC;
+        """)
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start(1000)
+        self.refresh()
+
+    def refresh(self):
+        total, new_entries = self.status_store.log(self.job_id, self.shown)
+        self.shown = total
+        if new_entries:
+            self.append("<br>".join(f"[{stamp}] <b>[{level}]</b> {html.escape(message)}"
+                                    for stamp, level, message in new_entries))
+
+
+class DashboardWindow(QWidget):
+    def __init__(self, status_store, refresh_ms: int = 250, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("GROMACS Simulation Dashboard")
+        self.resize(900, 500)
+        self.status_store = status_store
+        self.log_views = {}
+
+        layout = QVBoxLayout(self)
+        header = QHBoxLayout()
+        self.label_summary = QLabel("No jobs")
+        self.label_summary.setStyleSheet("font-weight: bold; color: #EEEEEE;")
+        header.addWidget(self.label_summary)
+        header.addStretch()
+        hint = QLabel("Double-click a job to open its log")
+        hint.setStyleSheet("color: #9E9E9E;")
+        header.addWidget(hint)
+        layout.addLayout(header)
+
+        self.model = JobTableModel(status_store, self)
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        self.table.setItemDelegateForColumn(3, ProgressDelegate(self.table))
+        self.table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Interactive)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        self.table.setColumnWidth(0, 200)
+        self.table.setColumnWidth(2, 220)
+        self.table.setColumnWidth(3, 160)
+        self.table.doubleClicked.connect(self.open_log)
+        self.table.setStyleSheet("""
+            QTableView {
+                background-color: #1e1e1e;
+                alternate-background-color: #2c2c2c;
+                color: #EEEEEE;
+                gridline-color: #444444;
+                border: 1px solid #444444;
+            }
+        """)
+        self.table.setAlternatingRowColors(True)
+        layout.addWidget(self.table)
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start(refresh_ms)
+
+    def refresh(self):
+        before = self.model.version
+        self.model.refresh()
+        if self.model.version == before:
+            return
+        counts = {}
+        for record in self.model.rows:
+            counts[record["state"]] = counts.get(record["state"], 0) + 1
+        self.label_summary.setText("  ".join(f"{state}: {count}" for state, count in sorted(counts.items())))
+
+    def open_log(self, index):
+        job_id = self.model.job_id(index.row())
+        view = self.log_views.get(job_id)
+        if view is None:
+            view = JobLogView(self.status_store, job_id, self.model.rows[index.row()]["name"])
+            view.destroyed.connect(lambda _=None, job_id=job_id: self.log_views.pop(job_id, None))
+            self.log_views[job_id] = view
+        view.show()
+        view.raise_()
@@ -1,39 +1,74 @@
 import os
+import shutil
 import logging
+import subprocess
 
 class EnvironmentManager:
-    def __init__(self, num_gpus: int, engine: str):
+    GPU_VARIABLES = ["CUDA_VISIBLE_DEVICES", "GMX_ENABLE_DIRECT_GPU_COMM", "GMX_GPU_DD_COMMS",
+                     "GMX_GPU_PME_PP_COMMS", "GMX_FORCE_UPDATE_DEFAULT_GPU", "GMX_CUDA_STREAMS",
+                     "GMX_USE_GPU_BUFFER_OPS", "GMX_PIN_VERLET_BUFFER", "GMX_CUDA_GRAPH"]
+    MANAGED_VARIABLES = GPU_VARIABLES + ["PATH", "GMXDATA"]
+
+    def __init__(self, num_gpus: int, engine: str, device_ids=None, gmx_folder: str = None):
         self.num_gpus = num_gpus
         self.engine = engine  # "CUDA" or "CPU"
+        # Overrides the bundled gmx/gmx_cpu install, e.g. with benchmarks/fake_gmx for load tests
+        self.gmx_folder = gmx_folder
+        # mdrun -gpu_id is relative to CUDA_VISIBLE_DEVICES, so gpu_ids always counts from 0
         self.gpu_ids = ",".join(str(i) for i in range(num_gpus)) if num_gpus > 0 else ""
+        self.device_ids = ",".join(str(i) for i in device_ids) if device_ids else self.gpu_ids
         self.logger = logging.getLogger("EnvironmentManager")
-    
-    def setup(self):
-        self.logger.debug("🔧 Setting environment variables")
+
+    @staticmethod
+    def detect_gpus() -> list:
+        if not shutil.which("nvidia-smi"):
+            return []
+        try:
+            result = subprocess.run(["nvidia-smi", "--query-gpu=index,name,memory.total", "--format=csv,noheader"],
+                                    stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, timeout=10)
+        except (OSError, subprocess.TimeoutExpired):
+            return []
+        gpus = []
+        for line in result.stdout.splitlines():
+            parts = [part.strip() for part in line.split(",")]
+            if len(parts) == 3 and parts[0].isdigit():
+                gpus.append({"index": int(parts[0]), "name": parts[1], "memory": parts[2]})
+        return gpus
+
+    def build_env(self, base=None) -> dict:
+        env = dict(os.environ if base is None else base)
         script_dir = os.path.dirname(os.path.realpath(__file__))
         if self.engine == "CUDA":
             gmx_folder = os.path.join(script_dir, "gmx")  # CUDA folder
             # Set environment variables for CUDA GPU
-            os.environ["CUDA_VISIBLE_DEVICES"] = self.gpu_ids
-            os.environ["GMX_ENABLE_DIRECT_GPU_COMM"] = "true"
-            os.environ["GMX_GPU_DD_COMMS"] = "true"
-            os.environ["GMX_GPU_PME_PP_COMMS"] = "true"
-            os.environ["GMX_FORCE_UPDATE_DEFAULT_GPU"] = "true"
-            os.environ["GMX_CUDA_STREAMS"] = "1"
-            os.environ["GMX_USE_GPU_BUFFER_OPS"] = "true"
-            os.environ["GMX_PIN_VERLET_BUFFER"] = "true"
-            os.environ["GMX_CUDA_GRAPH"] = "1"
-            self.logger.info(f"🖥️ CUDA environment configured with GPU IDs: {self.gpu_ids}")
+            env["CUDA_VISIBLE_DEVICES"] = self.device_ids
+            env["GMX_ENABLE_DIRECT_GPU_COMM"] = "true"
+            env["GMX_GPU_DD_COMMS"] = "true"
+            env["GMX_GPU_PME_PP_COMMS"] = "true"
+            env["GMX_FORCE_UPDATE_DEFAULT_GPU"] = "true"
+            env["GMX_CUDA_STREAMS"] = "1"
+            env["GMX_USE_GPU_BUFFER_OPS"] = "true"
+            env["GMX_PIN_VERLET_BUFFER"] = "true"
+            env["GMX_CUDA_GRAPH"] = "1"
+            self.logger.info(f"🖥️ CUDA environment configured with GPU IDs: {self.device_ids}")
         else:
             gmx_folder = os.path.join(script_dir, "gmx_cpu")  # CPU folder
             # Remove GPU environment variables if any
-            for var in ["CUDA_VISIBLE_DEVICES", "GMX_ENABLE_DIRECT_GPU_COMM", "GMX_GPU_DD_COMMS",
-                        "GMX_GPU_PME_PP_COMMS", "GMX_FORCE_UPDATE_DEFAULT_GPU", "GMX_CUDA_STREAMS",
-                        "GMX_USE_GPU_BUFFER_OPS", "GMX_PIN_VERLET_BUFFER", "GMX_CUDA_GRAPH"]:
-                os.environ.pop(var, None)
+            for var in self.GPU_VARIABLES:
+                env.pop(var, None)
             self.logger.info("🖥️ Configured for GROMACS CPU without CUDA")
+        if self.gmx_folder:
+            gmx_folder = os.path.abspath(self.gmx_folder)
+
+        env["PATH"] = os.path.join(gmx_folder, "bin") + os.pathsep + env.get("PATH", "")
+        env["GMXDATA"] = os.path.join(gmx_folder, "share", "gromacs")
 
-        os.environ["PATH"] = os.path.join(gmx_folder, "bin") + os.pathsep + os.environ.get("PATH", "")
-        os.environ["GMXDATA"] = os.path.join(gmx_folder, "share", "gromacs")
-        
         self.logger.info(f"📂 PATH and GMXDATA set from folder: {gmx_folder}")
+        return env
+
+    def setup(self):
+        self.logger.debug("🔧 Setting environment variables")
+        env = self.build_env()
+        for var in set(os.environ) - set(env):
+            os.environ.pop(var, None)
+        os.environ.update(env)
@@ -7,7 +7,7 @@ import logging
 from PyQt6.QtWidgets import (
     QWidget, QLabel, QLineEdit, QPushButton, QVBoxLayout,
     QHBoxLayout, QComboBox, QFileDialog, QTextEdit, QProgressBar,
-    QFrame, QGridLayout
+    QFrame, QGridLayout, QCheckBox
 )
 from PyQt6.QtGui import QIcon, QColor, QTextCursor, QPixmap
 from PyQt6.QtCore import Qt, QByteArray, QBuffer, QIODevice
@@ -18,6 +18,11 @@ from environment_manager import EnvironmentManager
 from mdp_file_manager import MDPFileManager
 from command_runner import CommandRunner
 from gpu_command_builder import GPUCommandBuilder
+from job_scheduler import PriorityScheduler, SimulationJob
+from status_store import StatusStore
+from dashboard import DashboardWindow
+from metrics_exporter import MetricsExporter
+from process_backend import ProcessBackend
 
 from PyQt6.QtCore import QObject, pyqtSignal, QThreadPool
 
@@ -37,7 +42,9 @@ log_formatter = logging.Formatter("%(asctime)s [%(levelname)s] %(name)s: %(messa
 qt_handler = QtHandler()
 qt_handler.setFormatter(log_formatter)
 
-for logger_name in ["EnvironmentManager", "MDPFileManager", "CommandRunner", "GPUCommandBuilder", "SimulationHelper"]:
+for logger_name in ["EnvironmentManager", "MDPFileManager", "CommandRunner", "GPUCommandBuilder", "SimulationHelper", "ProcessBackend",
+                    "PriorityScheduler", "ConvergenceMonitor", "TopologyProcessor",
+                    "ScratchStager", "MetricsExporter", "IOBudgetPlanner"]:
     logger = logging.getLogger(logger_name)
     logger.setLevel(logging.DEBUG)
     logger.addHandler(qt_handler)
@@ -78,6 +85,17 @@ class MainWindow(QWidget):
         self.setWindowIcon(QIcon(pixmap))
 
         self.threadpool = None
+        self.status_store = StatusStore()
+        self.scheduler = None
+        self.dashboard = None
+        self.metrics_exporter = None
+        # Optional Prometheus surface: a textfile-collector file and/or a localhost endpoint
+        metrics_file = os.environ.get("GMXAUTO_METRICS_FILE")
+        metrics_port = os.environ.get("GMXAUTO_METRICS_PORT")
+        if metrics_file or metrics_port:
+            self.metrics_exporter = MetricsExporter(self.status_store, path=metrics_file,
+                                                    port=int(metrics_port) if metrics_port else None)
+            self.metrics_exporter.start()
 
         self._init_ui()
         log_signal.new_log.connect(self.append_log)
@@ -157,6 +175,70 @@ class MainWindow(QWidget):
         form_layout.addWidget(lbl_unit, 5, 0)
         form_layout.addWidget(self.combo_unit, 5, 1)
 
+        # Adaptive equilibration
+        lbl_adaptive = QLabel("📉 Equilibration:")
+        self._set_label_dark(lbl_adaptive)
+        self.check_adaptive = QCheckBox("Stop early when converged")
+        self.check_adaptive.setStyleSheet("color: #EEEEEE;")
+        self.adaptive_supported = ProcessBackend.create().can_request_checkpoint
+        if not self.adaptive_supported:
+            self.check_adaptive.setEnabled(False)
+            self.check_adaptive.setToolTip("Needs mdrun to be stopped with a checkpoint, which is only possible on Linux")
+        form_layout.addWidget(lbl_adaptive, 6, 0)
+        form_layout.addWidget(self.check_adaptive, 6, 1)
+
+        # Hydrogen mass repartitioning
+        lbl_hmr = QLabel("⚖️ Timestep:")
+        self._set_label_dark(lbl_hmr)
+        self.check_hmr = QCheckBox("Hydrogen mass repartitioning (4 fs)")
+        self.check_hmr.setStyleSheet("color: #EEEEEE;")
+        form_layout.addWidget(lbl_hmr, 7, 0)
+        form_layout.addWidget(self.check_hmr, 7, 1)
+
+        # Local scratch staging
+        lbl_scratch = QLabel("🚚 Local Scratch:")
+        self._set_label_dark(lbl_scratch)
+        self.input_scratch = QLineEdit()
+        self.input_scratch.setPlaceholderText("Optional fast local folder (e.g. /dev/shm), empty = run in place")
+        self._set_lineedit_dark(self.input_scratch)
+        form_layout.addWidget(lbl_scratch, 8, 0)
+        form_layout.addWidget(self.input_scratch, 8, 1)
+
+        # Queue priority
+        lbl_priority = QLabel("🚦 Queue Priority:")
+        self._set_label_dark(lbl_priority)
+        self.input_priority = QLineEdit("0")
+        self.input_priority.setMaximumWidth(80)
+        self.input_priority.setToolTip("Higher runs first; queued GPU jobs may preempt running jobs of lower priority")
+        self._set_lineedit_dark(self.input_priority)
+        form_layout.addWidget(lbl_priority, 9, 0)
+        form_layout.addWidget(self.input_priority, 9, 1)
+
+        # Process isolation for shared Linux nodes
+        lbl_isolation = QLabel("🐧 Isolation (Linux):")
+        self._set_label_dark(lbl_isolation)
+        isolation_layout = QHBoxLayout()
+        self.input_reserved_cores = QLineEdit()
+        self.input_reserved_cores.setPlaceholderText("Keep cores free")
+        self.input_nice = QLineEdit()
+        self.input_nice.setPlaceholderText("Nice (0-19)")
+        self.combo_io_class = QComboBox()
+        self.combo_io_class.addItems(["Default IO", "best-effort", "idle"])
+        self._set_combobox_dark(self.combo_io_class)
+        self.input_cpu_limit = QLineEdit()
+        self.input_cpu_limit.setPlaceholderText("CPU limit (e.g. 3.5)")
+        self.input_memory_limit = QLineEdit()
+        self.input_memory_limit.setPlaceholderText("Memory limit (e.g. 16G)")
+        self.isolation_inputs = [self.input_reserved_cores, self.input_nice, self.combo_io_class,
+                                 self.input_cpu_limit, self.input_memory_limit]
+        for widget in self.isolation_inputs:
+            if isinstance(widget, QLineEdit):
+                self._set_lineedit_dark(widget)
+            widget.setEnabled(sys.platform.startswith("linux"))
+            isolation_layout.addWidget(widget)
+        form_layout.addWidget(lbl_isolation, 10, 0)
+        form_layout.addLayout(isolation_layout, 10, 1)
+
         main_layout.addLayout(form_layout)
 
         # Start and stop buttons
@@ -172,6 +254,16 @@ class MainWindow(QWidget):
         self.btn_stop.clicked.connect(self.stop_simulation)
         btn_layout.addWidget(self.btn_stop)
 
+        self.btn_queue = QPushButton("➕ Add to Queue")
+        self._set_button_dark(self.btn_queue)
+        self.btn_queue.clicked.connect(self.queue_simulation)
+        btn_layout.addWidget(self.btn_queue)
+
+        self.btn_dashboard = QPushButton("📊 Dashboard")
+        self._set_button_dark(self.btn_dashboard)
+        self.btn_dashboard.clicked.connect(self.show_dashboard)
+        btn_layout.addWidget(self.btn_dashboard)
+
         main_layout.addLayout(btn_layout)
 
         # Progress bars and log output
@@ -347,6 +439,11 @@ class MainWindow(QWidget):
         self.input_core.setEnabled(False)
         self.input_duration.setEnabled(False)
         self.combo_unit.setEnabled(False)
+        self.check_adaptive.setEnabled(False)
+        self.check_hmr.setEnabled(False)
+        self.input_scratch.setEnabled(False)
+        for widget in self.isolation_inputs:
+            widget.setEnabled(False)
         self.btn_browse.setEnabled(False)
         self.combo_engine.setEnabled(False)
         self.btn_start.setEnabled(False)
@@ -358,23 +455,21 @@ class MainWindow(QWidget):
         self.input_core.setEnabled(True)
         self.input_duration.setEnabled(True)
         self.combo_unit.setEnabled(True)
+        self.check_adaptive.setEnabled(self.adaptive_supported)
+        self.check_hmr.setEnabled(True)
+        self.input_scratch.setEnabled(True)
+        for widget in self.isolation_inputs:
+            widget.setEnabled(sys.platform.startswith("linux"))
         self.btn_browse.setEnabled(True)
         self.combo_engine.setEnabled(True)
         self.btn_start.setEnabled(True)
         self.btn_stop.setEnabled(False)
 
-    def start_simulation(self):
-        self.log_output.clear()
-        self.progress_overall.setValue(0)
-        self.progress_step.setValue(0)
-        self.disable_inputs()
-        self.label_current_step.setText("Current Step: -")
-
+    def read_form(self):
         folder = self.input_folder.text().strip()
         if not folder or not os.path.isdir(folder):
             self.append_log("ERROR", "❌ Invalid or no working folder selected.")
-            self.enable_inputs()
-            return
+            return None
         try:
             engine_text = self.combo_engine.currentText()
             engine = "CUDA" if engine_text == "CUDA (GPU)" else "CPU"
@@ -384,10 +479,44 @@ class MainWindow(QWidget):
             unit = self.combo_unit.currentText()
         except Exception:
             self.append_log("ERROR", "❌ GPU count, core count, and duration must be valid numbers.")
+            return None
+        isolation = {}
+        try:
+            if self.input_reserved_cores.text().strip():
+                isolation["reserved_cores"] = int(self.input_reserved_cores.text())
+            if self.input_nice.text().strip():
+                isolation["nice"] = int(self.input_nice.text())
+            if self.input_cpu_limit.text().strip():
+                isolation["cpu_limit"] = float(self.input_cpu_limit.text())
+        except ValueError:
+            self.append_log("ERROR", "❌ Reserved cores, nice level and CPU limit must be valid numbers.")
+            return None
+        if self.combo_io_class.currentIndex() > 0:
+            isolation["io_class"] = self.combo_io_class.currentText()
+        if self.input_memory_limit.text().strip():
+            isolation["memory_limit"] = self.input_memory_limit.text().strip()
+        options = {
+            "adaptive_equilibration": self.adaptive_supported and self.check_adaptive.isChecked(),
+            "hmr_factor": 3.0 if self.check_hmr.isChecked() else None,
+            "scratch_root": self.input_scratch.text().strip() or None,
+            "isolation": isolation,
+        }
+        return (folder, num_gpus, num_cores, duration, unit, engine), options
+
+    def start_simulation(self):
+        self.log_output.clear()
+        self.progress_overall.setValue(0)
+        self.progress_step.setValue(0)
+        self.disable_inputs()
+        self.label_current_step.setText("Current Step: -")
+
+        form = self.read_form()
+        if form is None:
             self.enable_inputs()
             return
+        args, options = form
 
-        self.worker = SimulationWorker(folder, num_gpus, num_cores, duration, unit, engine)
+        self.worker = SimulationWorker(*args, status_store=self.status_store, **options)
         self.worker.signals.log.connect(self.append_log)
         self.worker.signals.progress.connect(self.update_progress)
         self.worker.signals.finished.connect(self.simulation_finished)
@@ -401,9 +530,34 @@ class MainWindow(QWidget):
             "Step 6: Production"
         ]
         self.current_step_index = -1
+        self.current_step_name = None
 
         self.threadpool.start(self.worker)
 
+    def queue_simulation(self):
+        form = self.read_form()
+        if form is None:
+            return
+        args, options = form
+        try:
+            priority = int(self.input_priority.text())
+        except ValueError:
+            self.append_log("ERROR", "❌ Queue priority must be a whole number.")
+            return
+        if self.scheduler is None:
+            gpus = [gpu["index"] for gpu in EnvironmentManager.detect_gpus()] or [0]
+            self.scheduler = PriorityScheduler(gpu_devices=gpus, status_store=self.status_store)
+        job = self.scheduler.submit(SimulationJob(*args, priority=priority, name=os.path.basename(os.path.normpath(args[0])),
+                                                  **options))
+        self.append_log("INFO", f"➕ Job {job.job_id} ({job.name}) added to queue with priority {job.priority}")
+        self.show_dashboard()
+
+    def show_dashboard(self):
+        if self.dashboard is None:
+            self.dashboard = DashboardWindow(self.status_store)
+        self.dashboard.show()
+        self.dashboard.raise_()
+
     def stop_simulation(self):
         if self.worker:
             self.worker.interrupt()
@@ -411,7 +565,8 @@ class MainWindow(QWidget):
             self.btn_stop.setEnabled(False)
 
     def update_progress(self, percent, step_name):
-        if step_name != self.label_current_step.text()[14:]:
+        if step_name != self.current_step_name:
+            self.current_step_name = step_name
             self.current_step_index = self.steps_order.index(step_name) if step_name in self.steps_order else -1
             self.label_current_step.setText(f"Current Step: {step_name}")
             self.progress_step.setValue(0)
@@ -0,0 +1,268 @@
+import os
+import re
+import sys
+import math
+import time
+import logging
+import argparse
+import tempfile
+
+from mdp_file_manager import MDPFileManager
+
+class IOBudgetPlanner:
+    logger = logging.getLogger("IOBudgetPlanner")
+
+    # Empirical on-disk sizes, close enough to plan storage and bandwidth
+    XTC_BYTES_PER_ATOM = 4.0         # at compressed-x-precision = 1000, +3 bits per atom per doubling
+    TRR_BYTES_PER_ATOM = 12          # one single-precision xyz vector
+    FRAME_HEADER_BYTES = 100
+    EDR_BYTES_PER_FRAME = 600
+    LOG_BYTES_PER_BLOCK = 1200
+
+    DEFAULTS = {
+        "dt": 0.001, "nstxout": 0, "nstvout": 0, "nstfout": 0, "nstxout-compressed": 0,
+        "compressed-x-precision": 1000.0, "compressed-x-grps": "", "nstenergy": 1000,
+        "nstcalcenergy": 100, "nstlog": 1000,
+    }
+    SOLUTE_GROUPS = ("SOLU", "Protein", "non-Water", "non-water")
+    INTERVAL_FACTORS = (2, 4, 5, 10, 20, 25, 50, 100, 200, 500, 1000)
+
+    _write_speeds = {}  # device id -> measured sustained write speed, shared by every planner in the process
+
+    def __init__(self, workdir: str, mdp_name: str = "step5_production.mdp", gro_name: str = "step3_input.gro",
+                 index_name: str = "index.ndx"):
+        self.workdir = workdir
+        self.mdp_path = os.path.join(workdir, mdp_name)
+        self.gro_path = os.path.join(workdir, gro_name)
+        self.index_path = os.path.join(workdir, index_name)
+        self._groups = None
+
+    @staticmethod
+    def parse_size(text) -> int:
+        match = re.fullmatch(r"\s*([0-9.]+)\s*([KMGT]?)i?B?\s*", str(text), re.IGNORECASE)
+        if not match:
+            raise ValueError(f"Invalid size: {text}")
+        return int(float(match.group(1)) * 1024 ** " KMGT".index(match.group(2).upper() or " "))
+
+    @staticmethod
+    def format_size(size: float) -> str:
+        for unit in ("B", "KB", "MB", "GB"):
+            if size < 1024:
+                return f"{size:.1f} {unit}"
+            size /= 1024
+        return f"{size:.1f} TB"
+
+    def atom_count(self) -> int:
+        with open(self.gro_path, 'r') as f:
+            f.readline()
+            return int(f.readline().split()[0])
+
+    def group_sizes(self) -> dict:
+        if self._groups is None:
+            self._groups, current = {}, None
+            if os.path.exists(self.index_path):
+                with open(self.index_path, 'r') as f:
+                    for line in f:
+                        stripped = line.strip()
+                        if stripped.startswith("["):
+                            current = stripped.strip("[] ")
+                            self._groups[current] = 0
+                        elif current is not None:
+                            self._groups[current] += len(stripped.split())
+        return self._groups
+
+    def settings(self) -> dict:
+        settings = {}
+        for name, default in self.DEFAULTS.items():
+            value = MDPFileManager.read_parameter(self.mdp_path, name)
+            if value is None or value == "":
+                settings[name] = default
+            elif isinstance(default, str):
+                settings[name] = value
+            else:
+                settings[name] = type(default)(float(value))
+        return settings
+
+    def estimate(self, duration_ps: float, steps_per_second: float, settings: dict = None) -> dict:
+        settings = settings or self.settings()
+        natoms = self.atom_count()
+        nsteps = int(duration_ps / settings["dt"])
+        group = (settings["compressed-x-grps"] or "System").split()[0]
+        xtc_atoms = natoms if group == "System" else self.group_sizes().get(group, natoms)
+        precision_bits = 3 * math.log2(max(settings["compressed-x-precision"], 1.0) / 1000.0)
+        xtc_frame = xtc_atoms * max(self.XTC_BYTES_PER_ATOM + precision_bits / 8, 1.0) + self.FRAME_HEADER_BYTES
+        trr_vectors = [settings[key] for key in ("nstxout", "nstvout", "nstfout") if settings[key] > 0]
+
+        outputs = {
+            ".xtc": [(settings["nstxout-compressed"], xtc_frame)],
+            ".trr": [(interval, natoms * self.TRR_BYTES_PER_ATOM + self.FRAME_HEADER_BYTES) for interval in trr_vectors],
+            ".edr": [(settings["nstenergy"], self.EDR_BYTES_PER_FRAME)],
+            ".log": [(settings["nstlog"], self.LOG_BYTES_PER_BLOCK)],
+        }
+        files, total, bandwidth = {}, 0.0, 0.0
+        for suffix, streams in outputs.items():
+            size = rate = 0.0
+            frames = 0
+            for interval, frame_bytes in streams:
+                if interval <= 0:
+                    continue
+                frames += nsteps // interval
+                size += (nsteps // interval) * frame_bytes
+                rate += frame_bytes / interval * steps_per_second
+            files[suffix] = {"frames": frames, "bytes": size, "bytes_per_second": rate}
+            total += size
+            bandwidth += rate
+        return {"atoms": natoms, "xtc_atoms": xtc_atoms, "nsteps": nsteps, "files": files,
+                "total_bytes": total, "bytes_per_second": bandwidth}
+
+    @staticmethod
+    def measure_write_speed(directory: str, size_mb: int = 256, chunk_mb: int = 4) -> float:
+        # Sustained speed: the file is fsynced before the clock stops, so the page cache cannot flatter it.
+        # The test writes size_mb, so it runs once per device and later jobs reuse the result
+        device = os.stat(directory).st_dev
+        if device in IOBudgetPlanner._write_speeds:
+            return IOBudgetPlanner._write_speeds[device]
+        chunk = os.urandom(chunk_mb * 1024 * 1024)
+        written = 0
+        fd, path = tempfile.mkstemp(prefix=".gmxauto_disktest_", dir=directory)
+        try:
+            start = time.perf_counter()
+            with os.fdopen(fd, 'wb') as f:
+                while written < size_mb * 1024 * 1024:
+                    f.write(chunk)
+                    written += len(chunk)
+                f.flush()
+                os.fsync(f.fileno())
+            elapsed = time.perf_counter() - start
+        finally:
+            os.remove(path)
+        speed = written / elapsed
+        IOBudgetPlanner._write_speeds[device] = speed
+        IOBudgetPlanner.logger.info(f"💽 Sustained write speed in {directory}: {IOBudgetPlanner.format_size(speed)}/s")
+        return speed
+
+    def plan(self, duration_ps: float, steps_per_second: float, disk_speed: float = None,
+             max_io_fraction: float = 0.02, storage_budget: int = None, max_frame_interval_ps: float = 100.0) -> dict:
+        # Without a disk speed only the storage budget is enforced
+        current = self.settings()
+        settings = dict(current)
+        limit = max_io_fraction * disk_speed if disk_speed else None
+        notes = []
+
+        def fits(candidate):
+            estimate = self.estimate(duration_ps, steps_per_second, candidate)
+            return ((limit is None or estimate["bytes_per_second"] <= limit)
+                    and (storage_budget is None or estimate["total_bytes"] <= storage_budget))
+
+        if not fits(settings) and any(settings[key] > 0 for key in ("nstxout", "nstvout", "nstfout")):
+            for key in ("nstxout", "nstvout", "nstfout"):
+                settings[key] = 0
+            notes.append("full-precision .trr output disabled, final coordinates remain in .gro and .cpt")
+
+        groups = self.group_sizes()
+        solute = next((g for g in self.SOLUTE_GROUPS if g in groups), None)
+        if not fits(settings) and solute and (settings["compressed-x-grps"] or "System").split()[0] == "System" \
+                and settings["nstxout-compressed"] > 0:
+            settings["compressed-x-grps"] = solute
+            notes.append(f"compressed coordinates limited to {solute} ({groups[solute]} atoms)")
+
+        # Coarsen the trajectory first, energies and log only if that is not enough
+        max_steps = int(max_frame_interval_ps / settings["dt"])
+        # nstenergy must stay a multiple of nstcalcenergy, which is 0 or negative when mdrun picks it itself
+        calc = settings["nstcalcenergy"] if settings["nstcalcenergy"] > 0 else 1
+        caps = {"nstxout-compressed": max_steps, "nstlog": max_steps, "nstenergy": max(max_steps // calc, 1) * calc}
+        for keys in (("nstxout-compressed",), ("nstenergy", "nstlog")):
+            base = {key: settings[key] for key in keys if settings[key] > 0}
+            if fits(settings) or not base:
+                continue
+            for factor in self.INTERVAL_FACTORS:
+                for key, interval in base.items():
+                    settings[key] = min(interval * factor, max(caps[key], interval))
+                if fits(settings) or all(settings[key] >= caps[key] for key in base):
+                    break
+            if "nstxout-compressed" in base and settings["nstxout-compressed"] != base["nstxout-compressed"]:
+                notes.append(f"compressed frames every {settings['nstxout-compressed'] * settings['dt']:g} ps")
+
+        changes = {key: (current[key], settings[key]) for key in settings if settings[key] != current[key]}
+        before = self.estimate(duration_ps, steps_per_second, current)
+        after = self.estimate(duration_ps, steps_per_second, settings)
+        if not fits(settings):
+            notes.append("budget cannot be met without coarsening beyond "
+                         f"{max_frame_interval_ps:g} ps per frame, best effort shown")
+        return {"changes": changes, "before": before, "after": after, "fits": fits(settings),
+                "limit_bytes_per_second": limit, "storage_budget": storage_budget, "notes": notes}
+
+    def apply(self, plan: dict) -> None:
+        for key, (old, new) in plan["changes"].items():
+            MDPFileManager.write_parameter(self.mdp_path, key, new)
+            self.logger.info(f"✍️ {key}: {old} → {new}")
+
+    def describe(self, plan: dict) -> str:
+        before, after = plan["before"], plan["after"]
+        limits = []
+        if plan["limit_bytes_per_second"] is not None:
+            limits.append(f"limit {self.format_size(plan['limit_bytes_per_second'])}/s")
+        if plan["storage_budget"]:
+            limits.append(f"budget {self.format_size(plan['storage_budget'])}")
+        lines = [f"Output {self.format_size(before['total_bytes'])} at {self.format_size(before['bytes_per_second'])}/s"
+                 f" → {self.format_size(after['total_bytes'])} at {self.format_size(after['bytes_per_second'])}/s"
+                 + (f" ({', '.join(limits)})" if limits else "")]
+        for suffix, info in after["files"].items():
+            if info["frames"]:
+                lines.append(f"  {suffix}: {info['frames']} frames, {self.format_size(info['bytes'])}")
+        lines.extend(f"  {key}: {old} → {new}" for key, (old, new) in plan["changes"].items())
+        lines.extend(f"  note: {note}" for note in plan["notes"])
+        return "\n".join(lines)
+
+    @staticmethod
+    def steps_per_second_from_log(log_path: str, dt: float):
+        # mdrun reports ns/day at the end of every run, including runs stopped by a signal
+        if not os.path.exists(log_path):
+            return None
+        ns_per_day = None
+        with open(log_path, 'r', errors='replace') as f:
+            for line in f:
+                if line.startswith("Performance:"):
+                    ns_per_day = float(line.split()[1])
+        if not ns_per_day:
+            return None
+        return ns_per_day * 1000.0 / dt / 86400.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Estimate and limit GROMACS output size and write bandwidth")
+    parser.add_argument("workdir", help="CHARMM-GUI gromacs folder")
+    parser.add_argument("--duration", type=float, required=True, help="planned production length in ns")
+    parser.add_argument("--ns-per-day", type=float,
+                        help="expected speed (default: taken from step4.1_equilibration.log)")
+    parser.add_argument("--fraction", type=float, default=0.02, help="max share of step time spent writing")
+    parser.add_argument("--budget", help="storage budget for the run, e.g. 50G")
+    parser.add_argument("--disk-speed", help="sustained write speed per second, e.g. 500M (default: measured)")
+    parser.add_argument("--max-frame-interval", type=float, default=100.0, help="never write frames less often (ps)")
+    parser.add_argument("--apply", action="store_true", help="write the suggested settings into the production MDP")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s [%(levelname)s] %(name)s: %(message)s")
+    planner = IOBudgetPlanner(args.workdir)
+    dt = planner.settings()["dt"]
+    if args.ns_per_day:
+        steps_per_second = args.ns_per_day * 1000.0 / dt / 86400.0
+    else:
+        equilibration = os.path.join(args.workdir, "step4.1_equilibration")
+        eq_dt = MDPFileManager.extract_dt(equilibration + ".mdp")
+        steps_per_second = IOBudgetPlanner.steps_per_second_from_log(equilibration + ".log", eq_dt)
+        if steps_per_second is None:
+            parser.error("no equilibration log with a Performance line, pass --ns-per-day")
+    disk_speed = (IOBudgetPlanner.parse_size(args.disk_speed) if args.disk_speed
+                  else IOBudgetPlanner.measure_write_speed(args.workdir))
+    plan = planner.plan(args.duration * 1000.0, steps_per_second, disk_speed, args.fraction,
+                        IOBudgetPlanner.parse_size(args.budget) if args.budget else None, args.max_frame_interval)
+    print(planner.describe(plan))
+    if args.apply and plan["changes"]:
+        planner.apply(plan)
+        print(f"✅ Updated {planner.mdp_path}")
+    return 0 if plan["fits"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
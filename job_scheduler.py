@@ -0,0 +1,203 @@
+import time
+import logging
+import threading
+import itertools
+
+from PyQt6.QtCore import Qt, QObject, pyqtSignal, QThreadPool
+
+from simulation_worker import SimulationWorker
+from status_store import StatusStore
+
+class SimulationJob:
+    _ids = itertools.count(1)
+
+    def __init__(self, workdir, num_gpus, num_cores, duration, unit, engine, priority: int = 0, name: str = None,
+                 **options):
+        self.job_id = next(SimulationJob._ids)
+        self.name = name or workdir
+        self.workdir = workdir
+        self.num_gpus = num_gpus
+        self.num_cores = num_cores
+        self.duration = duration
+        self.unit = unit
+        self.engine = engine
+        self.priority = priority        # higher value = more urgent
+        self.options = options          # extra SimulationWorker keyword arguments
+        self.status = "queued"          # queued, running, preempting, parked, finished, failed, cancelled
+        self.devices = []
+        self.worker = None
+        self.cancel_requested = False
+        self.preempted_for = None       # job_id of the higher-priority job this one is checkpointing for
+        self.history = []
+        self.preempt_overhead = 0.0
+        self.resume_overhead = 0.0
+        self._submitted = time.time()
+        self._waiting_first_progress = None
+        self.record("queued")
+
+    def record(self, event: str, **details) -> None:
+        self.history.append({"time": time.time(), "event": event, **details})
+
+
+class PriorityScheduler(QObject):
+    job_changed = pyqtSignal(object)  # SimulationJob
+
+    logger = logging.getLogger("PriorityScheduler")
+
+    def __init__(self, gpu_devices=None, max_cpu_jobs: int = 1, backend_factory=None, status_store=None,
+                 isolation: dict = None):
+        super().__init__()
+        self.status_store = status_store or StatusStore()
+        self.gpu_devices = list(gpu_devices) if gpu_devices is not None else [0]
+        self.max_cpu_jobs = max_cpu_jobs
+        self.backend_factory = backend_factory
+        self.isolation = isolation      # default process isolation for jobs that do not set their own
+        self.jobs = []
+        self.threadpool = QThreadPool()
+        self.threadpool.setMaxThreadCount(max(len(self.gpu_devices) + max_cpu_jobs, 1) * 2)
+        self._free_devices = list(self.gpu_devices)
+        self._cpu_running = 0
+        self._lock = threading.RLock()
+
+    def submit(self, job: SimulationJob) -> SimulationJob:
+        with self._lock:
+            self.jobs.append(job)
+            self.status_store.register(job.job_id, job.name)
+            self.logger.info(f"📥 Job {job.job_id} ({job.name}) queued with priority {job.priority}")
+            self.job_changed.emit(job)
+            self._schedule()
+        return job
+
+    def cancel(self, job: SimulationJob) -> None:
+        with self._lock:
+            if job.status in ("queued", "parked"):
+                job.status = "cancelled"
+                job.record("cancelled")
+                self.status_store.update(job.job_id, state="cancelled")
+                self.job_changed.emit(job)
+            elif job.worker:
+                job.cancel_requested = True
+                job.worker.interrupt()
+
+    def _schedule(self) -> None:
+        pending = sorted((j for j in self.jobs if j.status in ("queued", "parked")),
+                         key=lambda j: (-j.priority, j._submitted))
+        held = 0  # free devices kept for a higher-priority job whose preemption is still in progress
+        for job in pending:
+            if self._can_start(job, held):
+                self._start(job)
+            elif job.engine == "CUDA":
+                available = max(len(self._free_devices) - held, 0)
+                self._preempt_for(job, available)
+                if any(j.status == "preempting" and j.preempted_for == job.job_id for j in self.jobs):
+                    # Devices freed by the first victims wait for the rest, lower priorities must not backfill them
+                    held += min(job.num_gpus, available)
+
+    def _can_start(self, job: SimulationJob, held: int = 0) -> bool:
+        if job.engine == "CUDA":
+            return len(self._free_devices) - held >= job.num_gpus
+        return self._cpu_running < self.max_cpu_jobs
+
+    def _preempt_for(self, job: SimulationJob, available: int) -> None:
+        # Devices already being released for this job count as free for this decision
+        releasing = sum(len(j.devices) for j in self.jobs if j.status == "preempting" and j.preempted_for == job.job_id)
+        needed = job.num_gpus - available - releasing
+        if needed <= 0:
+            return
+        victims = sorted((j for j in self.jobs
+                          if j.status == "running" and j.engine == "CUDA" and j.priority < job.priority
+                          and j.worker and j.worker.preemptible),
+                         key=lambda j: (j.priority, -j._submitted))
+        selected = []
+        for victim in victims:
+            if needed <= 0:
+                break
+            selected.append(victim)
+            needed -= len(victim.devices)
+        if needed > 0:
+            return
+        for victim in selected:
+            self.logger.info(f"⏸️ Preempting job {victim.job_id} (priority {victim.priority}) for job {job.job_id}")
+            victim.status = "preempting"
+            victim.preempted_for = job.job_id
+            victim.record("preempt_requested", by=job.job_id)
+            victim.worker.preempt()
+            self.status_store.update(victim.job_id, state="preempting")
+            self.job_changed.emit(victim)
+
+    def _start(self, job: SimulationJob) -> None:
+        if job.engine == "CUDA":
+            job.devices = self._free_devices[:job.num_gpus]
+            del self._free_devices[:job.num_gpus]
+        else:
+            self._cpu_running += 1
+        backend = self.backend_factory(job) if self.backend_factory else None
+        options = dict(job.options)
+        if self.isolation and not options.get("isolation"):
+            options["isolation"] = self.isolation
+        worker = SimulationWorker(job.workdir, job.num_gpus, job.num_cores, job.duration, job.unit,
+                                  job.engine, backend=backend, device_ids=job.devices or None,
+                                  status_store=self.status_store, job_id=job.job_id, **options)
+        worker.signals.progress.connect(lambda percent, step_name, job=job: self._on_progress(job, percent, step_name),
+                                        type=Qt.ConnectionType.DirectConnection)
+        worker.signals.finished.connect(lambda job=job: self._on_finished(job))
+        worker.signals.parked.connect(lambda job=job: self._on_parked(job))
+        resumed = job.status == "parked"
+        job.preempted_for = None
+        job.worker = worker
+        job.status = "running"
+        job.record("resumed" if resumed else "started", devices=list(job.devices))
+        job._waiting_first_progress = time.time() if resumed else None
+        self.logger.info(f"▶️ {'Resuming' if resumed else 'Starting'} job {job.job_id} on devices {job.devices}")
+        self.job_changed.emit(job)
+        self.threadpool.start(worker)
+
+    def _release(self, job: SimulationJob) -> None:
+        if job.engine == "CUDA":
+            self._free_devices.extend(job.devices)
+            self._free_devices.sort(key=self.gpu_devices.index)
+        else:
+            self._cpu_running -= 1
+        job.devices = []
+        job.worker = None
+
+    def _on_progress(self, job: SimulationJob, percent: int, step_name: str) -> None:
+        with self._lock:
+            # Resume overhead ends once the resumed production run reports progress again
+            if job._waiting_first_progress and step_name == "Step 6: Production" and percent < 100:
+                overhead = time.time() - job._waiting_first_progress
+                job.resume_overhead += overhead
+                job.record("resume_overhead", seconds=overhead)
+                job._waiting_first_progress = None
+
+    def _on_parked(self, job: SimulationJob) -> None:
+        with self._lock:
+            requested = next((e["time"] for e in reversed(job.history) if e["event"] == "preempt_requested"), None)
+            overhead = time.time() - requested if requested else 0.0
+            job.preempt_overhead += overhead
+            job.record("parked", seconds=overhead)
+            self._release(job)
+            if job.cancel_requested:
+                # Cancelled while checkpointing for preemption, so it must not be resumed later
+                job.status = "cancelled"
+                job.record("cancelled")
+                self.status_store.update(job.job_id, state="cancelled")
+                self.logger.info(f"🏁 Job {job.job_id} cancelled")
+            else:
+                job.status = "parked"
+                self.logger.info(f"🅿️ Job {job.job_id} parked after {overhead:.1f}s")
+            self.job_changed.emit(job)
+            self._schedule()
+
+    def _on_finished(self, job: SimulationJob) -> None:
+        with self._lock:
+            error = job.worker.error if job.worker else None
+            if error:
+                job.status = "cancelled" if job.cancel_requested else "failed"
+            else:
+                job.status = "finished"
+            job.record(job.status, error=error)
+            self._release(job)
+            self.logger.info(f"🏁 Job {job.job_id} {job.status}")
+            self.job_changed.emit(job)
+            self._schedule()
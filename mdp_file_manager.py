@@ -90,3 +90,51 @@ class MDPFileManager:
             file.writelines(lines)
         MDPFileManager.logger.info(f"✅ nstlist successfully written: {nstlist}")
         return nstlist
+
+    @staticmethod
+    def _key(name: str) -> str:
+        return name.strip().lower().replace('_', '-')
+
+    @staticmethod
+    def read_parameter(mdp_path: str, name: str):
+        MDPFileManager.logger.debug(f"🔍 Reading {name} from: {mdp_path}")
+        if not os.path.exists(mdp_path):
+            MDPFileManager.logger.warning(f"⚠️ {mdp_path} not found")
+            return None
+        with open(mdp_path, 'r') as file:
+            for line in file:
+                data = line.split(';', 1)[0]
+                if '=' not in data:
+                    continue
+                key, value = data.split('=', 1)
+                if MDPFileManager._key(key) == MDPFileManager._key(name):
+                    return value.strip()
+        return None
+
+    @staticmethod
+    def write_parameter(mdp_path: str, name: str, value) -> None:
+        MDPFileManager.logger.debug(f"✍️ Writing {name}={value} to file: {mdp_path}")
+        if not os.path.exists(mdp_path):
+            MDPFileManager.logger.warning(f"⚠️ File {mdp_path} not found")
+            return
+        with open(mdp_path, 'r') as file:
+            lines = file.readlines()
+
+        found = False
+        for i, line in enumerate(lines):
+            data = line.split(';', 1)[0]
+            if '=' not in data:
+                continue
+            key, _ = data.split('=', 1)
+            if MDPFileManager._key(key) == MDPFileManager._key(name):
+                lines[i] = f"{key.rstrip():<24}= {value}\n"
+                found = True
+                break
+
+        if not found:
+            lines.append(f"{name:<24}= {value}\n")
+            MDPFileManager.logger.info(f"ℹ️ {name} not found, appended at end of file")
+
+        with open(mdp_path, 'w') as file:
+            file.writelines(lines)
+        MDPFileManager.logger.info(f"✅ {name} successfully written: {value}")
@@ -0,0 +1,169 @@
+import os
+import re
+import time
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from status_store import StatusStore
+
+class MetricsExporter:
+    logger = logging.getLogger("MetricsExporter")
+
+    CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+    JOB_GAUGES = [
+        ("gmxauto_job_stage", "Pipeline step number the job is in (1-6)"),
+        ("gmxauto_job_progress_percent", "Progress of the current step in percent"),
+        ("gmxauto_job_steps_per_second", "MD steps per second over the last 30 s of the current step"),
+        ("gmxauto_job_ns_per_day", "Simulated nanoseconds per day in the current step"),
+        ("gmxauto_job_eta_seconds", "Estimated seconds until the current step finishes"),
+        ("gmxauto_job_checkpoint_age_seconds", "Seconds since the last checkpoint was written"),
+        ("gmxauto_job_last_update_age_seconds", "Seconds since the job's monitor last reported"),
+        ("gmxauto_job_last_progress_age_seconds", "Seconds since the job's step count last advanced"),
+    ]
+
+    def __init__(self, status_store: StatusStore, path: str = None, port: int = None,
+                 host: str = "127.0.0.1", interval: float = 15.0):
+        self.status_store = status_store
+        self.path = path
+        self.port = port
+        self.host = host
+        self.interval = interval
+        self.server = None
+        self._stop = threading.Event()
+        self._threads = []
+
+    @staticmethod
+    def _label(value) -> str:
+        return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+    @staticmethod
+    def _number(value: float) -> str:
+        return repr(float(value)) if value != float("inf") else "+Inf"
+
+    def _histogram(self, lines: list, name: str, help_text: str, series: list) -> None:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} histogram")
+        for labels, (buckets, total, count) in series:
+            prefix = "".join(f'{key}="{self._label(value)}",' for key, value in labels.items())
+            for bound, cumulative in buckets:
+                lines.append(f'{name}_bucket{{{prefix}le="{self._number(bound)}"}} {cumulative}')
+            lines.append(f'{name}_bucket{{{prefix}le="+Inf"}} {count}')
+            suffix = "{" + prefix.rstrip(",") + "}" if prefix else ""
+            lines.append(f"{name}_sum{suffix} {self._number(total)}")
+            lines.append(f"{name}_count{suffix} {count}")
+
+    def render(self) -> str:
+        now = time.time()
+        _, records = self.status_store.changed_since(0)
+        stages, loop = self.status_store.histograms()
+        lines = []
+
+        lines.append("# HELP gmxauto_job_info Current state and step name of each job")
+        lines.append("# TYPE gmxauto_job_info gauge")
+        for r in records:
+            lines.append(f'gmxauto_job_info{{job="{self._label(r["job_id"])}",name="{self._label(r["name"])}",'
+                         f'state="{r["state"]}",stage="{self._label(r["stage"])}"}} 1')
+
+        active = [r for r in records if r["state"] not in StatusStore.FINAL_STATES]
+        values = {}
+        for r in active:
+            stage = re.match(r"Step (\d+)", r["stage"])
+            checkpoint = r["last_checkpoint"]
+            values[r["job_id"]] = [
+                int(stage.group(1)) if stage else None,
+                r["percent"],
+                r["steps_per_second"],
+                r["ns_per_day"],
+                r["eta"],
+                now - checkpoint if checkpoint else None,
+                now - r["updated"],
+                now - r["last_progress"] if r["last_progress"] else None,
+            ]
+        for i, (name, help_text) in enumerate(self.JOB_GAUGES):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} gauge")
+            for r in active:
+                value = values[r["job_id"]][i]
+                if value is not None:
+                    lines.append(f'{name}{{job="{self._label(r["job_id"])}",name="{self._label(r["name"])}"}} '
+                                 f"{self._number(value)}")
+
+        counts = {state: 0 for state in ("queued", "running", "preempting", "parked") + StatusStore.FINAL_STATES}
+        for r in records:
+            counts[r["state"]] = counts.get(r["state"], 0) + 1
+        lines.append("# HELP gmxauto_jobs Jobs currently in each state")
+        lines.append("# TYPE gmxauto_jobs gauge")
+        for state in ("queued", "running", "preempting", "parked"):
+            lines.append(f'gmxauto_jobs{{state="{state}"}} {counts[state]}')
+        for state in StatusStore.FINAL_STATES:
+            lines.append(f"# HELP gmxauto_jobs_{state}_total Jobs that ended as {state}")
+            lines.append(f"# TYPE gmxauto_jobs_{state}_total counter")
+            lines.append(f"gmxauto_jobs_{state}_total {counts[state]}")
+
+        self._histogram(lines, "gmxauto_stage_duration_seconds", "Wall time of completed pipeline steps",
+                        [({"stage": stage}, data) for stage, data in sorted(stages.items())])
+        self._histogram(lines, "gmxauto_monitor_loop_latency_seconds",
+                        "Time the mdrun monitor loop spends per poll beyond its sleep", [({}, loop)])
+        return "\n".join(lines) + "\n"
+
+    def write(self) -> None:
+        # Write-then-rename so the node_exporter textfile collector never reads a partial file
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(self.render())
+        os.replace(tmp_path, self.path)
+
+    def _write_loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.write()
+            except OSError as e:
+                self.logger.warning(f"⚠️ Could not write metrics to {self.path}: {e}")
+            self._stop.wait(self.interval)
+
+    def start(self) -> None:
+        if self.path:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            thread = threading.Thread(target=self._write_loop, name="MetricsWriter", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+            self.logger.info(f"📈 Writing metrics to {self.path} every {self.interval:.0f}s")
+        if self.port is not None:
+            exporter = self
+
+            class Handler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    if self.path.split("?")[0] not in ("/", "/metrics"):
+                        self.send_error(404)
+                        return
+                    body = exporter.render().encode()
+                    self.send_response(200)
+                    self.send_header("Content-Type", exporter.CONTENT_TYPE)
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                def log_message(self, format, *args):
+                    pass
+
+            self.server = ThreadingHTTPServer((self.host, self.port), Handler)
+            self.server.daemon_threads = True
+            self.port = self.server.server_address[1]
+            thread = threading.Thread(target=self.server.serve_forever, name="MetricsServer", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+            self.logger.info(f"📈 Serving metrics on http://{self.host}:{self.port}/metrics")
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+        for thread in self._threads:
+            thread.join()
+        if self.path:
+            try:
+                self.write()
+            except OSError:
+                pass
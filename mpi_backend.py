@@ -0,0 +1,144 @@
+import os
+import shlex
+import signal
+import socket
+import tempfile
+import subprocess
+
+from process_backend import ProcessBackend
+from environment_manager import EnvironmentManager
+
+class MPIProcessBackend(ProcessBackend):
+    LAUNCHERS = ("openmpi", "mpich", "srun")
+    # The launcher forwards SIGTERM to the ranks and SIGKILLs them after a grace period. Only Open MPI lets a job
+    # set that period (odls_base_sigkill_timeout, 1 s by default). Hydra's is fixed and Slurm's KillWait is set by
+    # the cluster, so with those launchers a checkpoint request may lose everything since the last periodic one
+    CHECKPOINT_LAUNCHERS = ("openmpi",)
+    # Thread-MPI and pinning flags from GPUCommandBuilder that the MPI layout replaces
+    DROPPED_FLAGS = {"-nt": 1, "-ntmpi": 1, "-ntomp": 1, "-gpu_id": 1, "-npme": 1,
+                     "-pin": 1, "-pinoffset": 1, "-pinstride": 1}
+
+    def __init__(self, launcher: str = "openmpi", hosts=None, hostfile: str = None, nodes: int = None,
+                 gpus_per_node: int = 1, cores_per_node: int = None, gmx_binary: str = "gmx_mpi",
+                 launcher_path: str = None, launcher_args=None, export_variables=None,
+                 checkpoint_grace: float = 300):
+        super().__init__()
+        if launcher not in self.LAUNCHERS:
+            raise ValueError(f"Unknown MPI launcher '{launcher}', use one of {', '.join(self.LAUNCHERS)}")
+        self.launcher = launcher
+        self.hosts = list(hosts or [])
+        self.nodes = nodes or len(self.hosts) or 1
+        self.gpus_per_node = max(gpus_per_node, 1)
+        self.cores_per_node = cores_per_node or os.cpu_count() or 1
+        self.gmx_binary = gmx_binary
+        self.launcher_path = launcher_path or {"openmpi": "mpirun", "mpich": "mpiexec", "srun": "srun"}[launcher]
+        self.launcher_args = list(launcher_args or [])
+        self.export_variables = list(export_variables or EnvironmentManager.MANAGED_VARIABLES)
+        self.hostfile = hostfile
+        self.checkpoint_grace = checkpoint_grace    # seconds mdrun gets to write its checkpoint after SIGTERM
+        self._own_hostfile = False
+
+    @property
+    def can_request_checkpoint(self) -> bool:
+        return self.launcher in self.CHECKPOINT_LAUNCHERS
+
+    @property
+    def ranks(self) -> int:
+        return self.nodes * self.gpus_per_node
+
+    @property
+    def local_launch(self) -> bool:
+        # Device ids chosen by the local scheduler only mean something when every rank runs on this machine
+        local_names = ("localhost", "127.0.0.1", socket.gethostname())
+        return self.launcher != "srun" and self.nodes == 1 and all(host in local_names for host in self.hosts)
+
+    @property
+    def threads_per_rank(self) -> int:
+        return max(self.cores_per_node // self.gpus_per_node, 1)
+
+    def _write_hostfile(self) -> str:
+        fd, path = tempfile.mkstemp(prefix="gmxauto_hosts_", text=True)
+        with os.fdopen(fd, 'w') as f:
+            for host in self.hosts:
+                if self.launcher == "openmpi":
+                    f.write(f"{host} slots={self.gpus_per_node}\n")
+                else:
+                    f.write(f"{host}:{self.gpus_per_node}\n")
+        self._own_hostfile = True
+        self.logger.info(f"📄 Hostfile written: {path} ({len(self.hosts)} nodes)")
+        return path
+
+    def launcher_command(self, env: dict = None) -> list:
+        ranks, ppn, ntomp = self.ranks, self.gpus_per_node, self.threads_per_rank
+        variables = [var for var in self.export_variables if (env is None or var in env)
+                     and (self.local_launch or var != "CUDA_VISIBLE_DEVICES")]
+        if self.hosts and not self.hostfile and self.launcher != "srun":
+            self.hostfile = self._write_hostfile()
+        if self.launcher == "openmpi":
+            cmd = [self.launcher_path, "-np", str(ranks), "--map-by", f"ppr:{ppn}:node:PE={ntomp}",
+                   "--bind-to", "core", "--mca", "odls_base_sigkill_timeout", str(int(self.checkpoint_grace))]
+            if self.hostfile:
+                cmd += ["--hostfile", self.hostfile]
+            for var in variables:
+                cmd += ["-x", var]
+        elif self.launcher == "mpich":
+            cmd = [self.launcher_path, "-n", str(ranks), "-ppn", str(ppn), "-bind-to", f"core:{ntomp}"]
+            if self.hostfile:
+                cmd += ["-f", self.hostfile]
+            if variables:
+                cmd += ["-genvlist", ",".join(variables)]
+        else:
+            # srun propagates the whole submitting environment to every task with --export=ALL
+            cmd = [self.launcher_path, f"--nodes={self.nodes}", f"--ntasks-per-node={ppn}",
+                   f"--cpus-per-task={ntomp}", "--cpu-bind=cores", "--export=ALL"]
+            if self.hosts:
+                cmd.append(f"--nodelist={','.join(self.hosts)}")
+        return cmd + self.launcher_args
+
+    def build(self, args: list, env: dict = None) -> list:
+        mdrun_args = []
+        i = args.index("mdrun") + 1
+        while i < len(args):
+            flag = args[i]
+            if flag in self.DROPPED_FLAGS:
+                i += 1 + self.DROPPED_FLAGS[flag]
+                continue
+            mdrun_args.append(flag)
+            i += 1
+
+        mdrun_args += ["-ntomp", str(self.threads_per_rank), "-pin", "off"]
+        devices = (env or {}).get("CUDA_VISIBLE_DEVICES")
+        if devices and self.local_launch and len(devices.split(",")) != self.gpus_per_node:
+            raise ValueError(f"{len(devices.split(','))} GPUs assigned ({devices}) but the MPI layout uses "
+                             f"gpus_per_node = {self.gpus_per_node}")
+        if env is None or devices:
+            # One PP rank per GPU on every node; GPU ids are relative to CUDA_VISIBLE_DEVICES
+            mdrun_args += ["-gpu_id", ",".join(str(g) for g in range(self.gpus_per_node))]
+            if self.ranks > 1 and "-pme" in mdrun_args and mdrun_args[mdrun_args.index("-pme") + 1] == "gpu":
+                mdrun_args += ["-npme", "1"]
+        return self.launcher_command(env) + [self.gmx_binary, "mdrun"] + mdrun_args
+
+    def popen(self, command, **kwargs) -> subprocess.Popen:
+        if isinstance(command, str) and not kwargs.get("shell"):
+            command = shlex.split(command)
+        if isinstance(command, list) and "mdrun" in command:
+            command = self.build(command, kwargs.get("env"))
+            if kwargs.get("env") and not self.local_launch:
+                # Remote ranks use every GPU of their node, local device ids must not leak to them
+                kwargs["env"] = {k: v for k, v in kwargs["env"].items() if k != "CUDA_VISIBLE_DEVICES"}
+            self.logger.info(f"🌐 MPI launch ({self.ranks} ranks × {self.threads_per_rank} threads): "
+                             f"{' '.join(shlex.quote(part) for part in command)}")
+        return super().popen(command, **kwargs)
+
+    def request_checkpoint(self, process: subprocess.Popen) -> None:
+        # The launcher forwards SIGTERM to every rank, mdrun then checkpoints and exits
+        if not self.can_request_checkpoint:
+            self.logger.warning(f"⚠️ {self.launcher} may kill the ranks of process {process.pid} before mdrun "
+                                f"checkpoints, resume may fall back to the last periodic checkpoint")
+        process.send_signal(signal.SIGTERM)
+
+    def close(self) -> None:
+        if self._own_hostfile and self.hostfile and os.path.exists(self.hostfile):
+            os.remove(self.hostfile)
+            self.hostfile = None
+            self._own_hostfile = False
@@ -0,0 +1,298 @@
+import os
+import sys
+import signal
+import shlex
+import ctypes
+import shutil
+import threading
+import subprocess
+import logging
+
+class ProcessBackend:
+    logger = logging.getLogger("ProcessBackend")
+
+    can_request_checkpoint = True   # request_checkpoint() makes mdrun write a checkpoint and exit cleanly
+
+    def __init__(self):
+        self.usage = {}
+
+    @staticmethod
+    def create(num_cores: int = 0, **options) -> "ProcessBackend":
+        if sys.platform.startswith("win"):
+            return WindowsProcessBackend()
+        if sys.platform.startswith("linux"):
+            return LinuxProcessBackend(num_cores=num_cores, **options)
+        return ProcessBackend()
+
+    def popen_kwargs(self) -> dict:
+        return {}
+
+    def adjust_command(self, command: str) -> str:
+        return command
+
+    def popen(self, command, **kwargs) -> subprocess.Popen:
+        kwargs.update(self.popen_kwargs())
+        if isinstance(command, str) and not kwargs.get("shell"):
+            command = shlex.split(command)
+        process = subprocess.Popen(command, **kwargs)
+        self.logger.debug(f"🚀 Started process {process.pid}")
+        self.attach(process)
+        return process
+
+    def attach(self, process: subprocess.Popen) -> None:
+        pass
+
+    def poll(self, process: subprocess.Popen):
+        return process.poll()
+
+    def wait(self, process: subprocess.Popen):
+        return process.wait()
+
+    def release(self, process: subprocess.Popen) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+    def request_checkpoint(self, process: subprocess.Popen) -> None:
+        # mdrun handles SIGINT by writing a checkpoint at the next neighbour-search step and exiting
+        process.send_signal(signal.SIGINT)
+
+    def run(self, command: str, cwd: str = None, env: dict = None) -> subprocess.CompletedProcess:
+        process = self.popen(command, shell=True, text=True, cwd=cwd, env=env,
+                             stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        try:
+            # Drain both pipes without communicate(), which would reap the child before wait() sees its rusage
+            stderr = []
+            reader = threading.Thread(target=lambda: stderr.append(process.stderr.read()), daemon=True)
+            reader.start()
+            stdout = process.stdout.read()
+            reader.join()
+            stderr = stderr[0] if stderr else ""
+            process.stdout.close()
+            process.stderr.close()
+            self.wait(process)
+        finally:
+            self.release(process)
+        if process.returncode != 0:
+            raise subprocess.CalledProcessError(process.returncode, command, stdout, stderr)
+        return subprocess.CompletedProcess(command, process.returncode, stdout, stderr)
+
+
+class WindowsProcessBackend(ProcessBackend):
+    can_request_checkpoint = False
+    def popen_kwargs(self) -> dict:
+        return {"creationflags": subprocess.CREATE_NO_WINDOW}
+
+    def request_checkpoint(self, process: subprocess.Popen) -> None:
+        # No console signal reaches a windowless mdrun, so resume falls back to its last periodic checkpoint
+        self.logger.warning(f"⚠️ Process {process.pid} cannot be signalled on Windows, using last periodic checkpoint")
+        process.terminate()
+
+
+class CoreAllocator:
+    _lock = threading.Lock()
+    _busy = set()
+
+    @classmethod
+    def acquire(cls, count: int, reserved: int = 0) -> list:
+        available = sorted(os.sched_getaffinity(0))
+        # Keep the first cores free for the GUI and analysis scripts
+        available = available[reserved:]
+        with cls._lock:
+            free = [core for core in available if core not in cls._busy]
+            if count <= 0 or count > len(free):
+                return []
+            cores = free[:count]
+            cls._busy.update(cores)
+        return cores
+
+    @classmethod
+    def release(cls, cores) -> None:
+        with cls._lock:
+            cls._busy.difference_update(cores)
+
+
+class LinuxProcessBackend(ProcessBackend):
+    IO_CLASSES = {"realtime": 1, "best-effort": 2, "idle": 3}
+    IOPRIO_SET = {"x86_64": 251, "aarch64": 30, "ppc64le": 273, "i686": 289, "armv7l": 314}
+
+    def __init__(self, num_cores: int = 0, reserved_cores: int = 0, nice: int = 0,
+                 io_class: str = None, io_level: int = 4, cpu_limit: float = None,
+                 memory_limit: str = None, cgroup_root: str = "/sys/fs/cgroup/gmxauto"):
+        super().__init__()
+        self.num_cores = num_cores
+        self.reserved_cores = reserved_cores
+        self.nice = nice
+        self.io_class = io_class
+        self.io_level = io_level
+        self.cpu_limit = cpu_limit          # number of CPUs, e.g. 3.5
+        self.memory_limit = memory_limit    # cgroup v2 syntax, e.g. "16G"
+        self.cgroup_root = cgroup_root
+        self.cores = []
+        self._cgroups = {}
+        self._cgroup_count = 0
+        self._reserve_failed = False
+
+    def reserve_cores(self) -> list:
+        if self.num_cores and not self.cores and not self._reserve_failed:
+            self.cores = CoreAllocator.acquire(self.num_cores, self.reserved_cores)
+            if self.cores:
+                self.logger.info(f"🧵 Reserved cores {self.cores}")
+            else:
+                self._reserve_failed = True
+                self.logger.warning(f"⚠️ Unable to reserve {self.num_cores} free cores, running without affinity or pinning")
+        return self.cores
+
+    def adjust_command(self, command: str) -> str:
+        # mdrun -pin on overrides an external affinity mask, so let mdrun stay inside our cores. Without a
+        # reservation every job would pin to cores 0..n-1, so pinning is switched off in that case too
+        self.reserve_cores()
+        return command.replace("-pin on -pinoffset 0 -pinstride 1", "-pin off")
+
+    def _ioprio(self, pid: int) -> None:
+        io_class = self.IO_CLASSES.get(self.io_class)
+        syscall = self.IOPRIO_SET.get(os.uname().machine)
+        if io_class is None or syscall is None:
+            self.logger.warning(f"⚠️ IO priority class {self.io_class} not applied")
+            return
+        libc = ctypes.CDLL(None, use_errno=True)
+        # IOPRIO_WHO_PROCESS = 1, priority value is class << 13 | level
+        value = (io_class << 13) | (0 if io_class == 3 else self.io_level)
+        if libc.syscall(syscall, 1, pid, value) != 0:
+            self.logger.warning(f"⚠️ IO priority not applied to process {pid}: {os.strerror(ctypes.get_errno())}")
+
+    def _limit_wrapper(self):
+        # taskset, nice and ionice apply the limits and exec the command, so nothing runs between fork and
+        # exec in this (multithreaded) process. Limits whose tool is missing are set on the pid after spawn
+        prefix, late = [], []
+        taskset, nice, ionice = shutil.which("taskset"), shutil.which("nice"), shutil.which("ionice")
+        if self.cores:
+            if taskset:
+                prefix += [taskset, "-c", ",".join(str(core) for core in self.cores)]
+            else:
+                late.append(lambda pid: os.sched_setaffinity(pid, self.cores))
+        if self.nice:
+            if nice:
+                prefix += [nice, "-n", str(self.nice)]
+            else:
+                late.append(lambda pid: os.setpriority(os.PRIO_PROCESS, pid, self.nice))
+        if self.io_class:
+            io_class = self.IO_CLASSES.get(self.io_class)
+            if io_class and ionice:
+                prefix += [ionice, "-c", str(io_class)] + ([] if io_class == 3 else ["-n", str(self.io_level)])
+            else:
+                late.append(self._ioprio)
+        return prefix, late
+
+    def _make_cgroup(self):
+        self._cgroup_count += 1
+        path = os.path.join(self.cgroup_root, f"job_{os.getpid()}_{id(self)}_{self._cgroup_count}")
+        try:
+            os.makedirs(path, exist_ok=True)
+            controllers = os.path.join(self.cgroup_root, "cgroup.subtree_control")
+            with open(controllers, "w") as f:
+                f.write(("+cpu " if self.cpu_limit else "") + ("+memory" if self.memory_limit else ""))
+            if self.cpu_limit:
+                period = 100000
+                with open(os.path.join(path, "cpu.max"), "w") as f:
+                    f.write(f"{int(self.cpu_limit * period)} {period}")
+            if self.memory_limit:
+                with open(os.path.join(path, "memory.max"), "w") as f:
+                    f.write(str(self.memory_limit))
+            return path
+        except OSError as e:
+            self.logger.warning(f"⚠️ cgroup limits not applied ({path}): {e}")
+            self._remove_cgroup(path)
+            return None
+
+    @staticmethod
+    def _remove_cgroup(path: str) -> None:
+        try:
+            os.rmdir(path)
+        except OSError:
+            pass
+
+    def popen(self, command, **kwargs) -> subprocess.Popen:
+        self.reserve_cores()
+        prefix, late = self._limit_wrapper()
+        if prefix:
+            if kwargs.pop("shell", False):
+                command = prefix + ["/bin/sh", "-c", command]
+            else:
+                command = prefix + (shlex.split(command) if isinstance(command, str) else list(command))
+        cgroup = self._make_cgroup() if self.cpu_limit or self.memory_limit else None
+        try:
+            process = super().popen(command, **kwargs)
+        except Exception:
+            if cgroup:
+                self._remove_cgroup(cgroup)
+            raise
+        for apply in late:
+            try:
+                apply(process.pid)
+            except OSError as e:
+                self.logger.warning(f"⚠️ Limit not applied to process {process.pid}: {e}")
+        if cgroup:
+            # Moving the pid moves all of its threads; the wrappers exec in place, so mdrun keeps this pid
+            try:
+                with open(os.path.join(cgroup, "cgroup.procs"), "w") as f:
+                    f.write(str(process.pid))
+                self._cgroups[process.pid] = cgroup
+                self.logger.info(f"📦 Process {process.pid} placed in cgroup {cgroup}")
+            except OSError as e:
+                self.logger.warning(f"⚠️ Process {process.pid} not placed in cgroup {cgroup}: {e}")
+                self._remove_cgroup(cgroup)
+        return process
+
+    def _record_usage(self, process: subprocess.Popen, status: int, rusage) -> None:
+        if os.WIFSIGNALED(status):
+            process.returncode = -os.WTERMSIG(status)
+        else:
+            process.returncode = os.WEXITSTATUS(status)
+        self.usage[process.pid] = {
+            "user_time": rusage.ru_utime,
+            "system_time": rusage.ru_stime,
+            "max_rss_kb": rusage.ru_maxrss,
+            "block_in": rusage.ru_inblock,
+            "block_out": rusage.ru_oublock,
+            "ctx_switches": rusage.ru_nvcsw + rusage.ru_nivcsw,
+        }
+        self.logger.info(
+            f"📊 Process {process.pid} usage | user {rusage.ru_utime:.1f}s | sys {rusage.ru_stime:.1f}s | "
+            f"maxrss {rusage.ru_maxrss / 1024:.0f} MB"
+        )
+
+    def poll(self, process: subprocess.Popen):
+        if process.returncode is not None:
+            return process.returncode
+        try:
+            pid, status, rusage = os.wait4(process.pid, os.WNOHANG)
+        except ChildProcessError:
+            return process.poll()
+        if pid == 0:
+            return None
+        self._record_usage(process, status, rusage)
+        return process.returncode
+
+    def wait(self, process: subprocess.Popen):
+        if process.returncode is not None:
+            return process.returncode
+        try:
+            _, status, rusage = os.wait4(process.pid, 0)
+        except ChildProcessError:
+            return process.wait()
+        self._record_usage(process, status, rusage)
+        return process.returncode
+
+    def release(self, process: subprocess.Popen) -> None:
+        path = self._cgroups.pop(process.pid, None)
+        if path:
+            self._remove_cgroup(path)
+
+    def close(self) -> None:
+        if self.cores:
+            CoreAllocator.release(self.cores)
+            self.logger.info(f"🧵 Released cores {self.cores}")
+            self.cores = []
+        self._reserve_failed = False
@@ -0,0 +1,378 @@
+import os
+import re
+import sys
+import json
+import hmac
+import time
+import shutil
+import socket
+import logging
+import argparse
+import ipaddress
+import platform
+import threading
+import itertools
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from PyQt6.QtCore import Qt
+
+from simulation_worker import SimulationWorker
+from environment_manager import EnvironmentManager
+from scratch_stager import ScratchStager
+from status_store import StatusStore
+
+class AgentBusy(RuntimeError):
+    """The agent has no free GPUs or CPU job slot for a job right now."""
+
+
+class RemoteJob:
+    def __init__(self, job_id: str, spec: dict, workdir: str):
+        self.job_id = job_id
+        self.spec = spec
+        self.workdir = workdir
+        self.state = "uploading"    # uploading, running, finished, failed, cancelled
+        self.devices = []
+        self.worker = None
+        self.error = None
+        self.cancel_requested = False
+
+
+class RemoteAgent:
+    logger = logging.getLogger("RemoteAgent")
+
+    CHUNK_SIZE = ScratchStager.CHUNK_SIZE
+    # SimulationWorker options a controller may set; anything else stays under the agent's control
+    JOB_OPTIONS = ("adaptive_equilibration", "convergence_options", "hmr_factor", "hmr_timestep", "hmr_smoke_steps")
+
+    def __init__(self, root: str, host: str = "127.0.0.1", port: int = 8765, gpu_devices=None,
+                 max_cpu_jobs: int = 1, token: str = None, gmx_folder: str = None, scratch_root: str = None):
+        self.root = os.path.abspath(root)
+        self.host = host
+        self.port = port
+        self.gpu_devices = (list(gpu_devices) if gpu_devices is not None
+                            else [gpu["index"] for gpu in EnvironmentManager.detect_gpus()])
+        self.max_cpu_jobs = max_cpu_jobs
+        self.token = token
+        self.gmx_folder = gmx_folder
+        self.scratch_root = scratch_root
+        self.status_store = StatusStore()
+        self.jobs = {}
+        self.server = None
+        self._free_devices = list(self.gpu_devices)
+        self._cpu_running = 0
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._hardware = None
+        os.makedirs(self.root, exist_ok=True)
+
+    @staticmethod
+    def memory_total() -> int:
+        try:
+            return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+        except (ValueError, OSError, AttributeError):
+            return None
+
+    @staticmethod
+    def is_loopback(host: str) -> bool:
+        try:
+            addresses = {info[4][0] for info in socket.getaddrinfo(host, None)}
+        except socket.gaierror:
+            return False
+        return bool(addresses) and all(ipaddress.ip_address(address.split("%")[0]).is_loopback
+                                       for address in addresses)
+
+    def hardware(self) -> dict:
+        # The machine description does not change while the agent runs, so nvidia-smi is only asked once
+        if self._hardware is None:
+            cores = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count()
+            gpus = {gpu["index"]: gpu for gpu in EnvironmentManager.detect_gpus()}
+            self._hardware = {
+                "hostname": socket.gethostname(),
+                "platform": platform.platform(),
+                "cpu_cores": cores,
+                "memory_bytes": self.memory_total(),
+                "gpus": [gpus.get(index, {"index": index, "name": "unknown", "memory": None})
+                         for index in self.gpu_devices],
+            }
+        return {**self._hardware, "disk_free_bytes": shutil.disk_usage(self.root).free}
+
+    def info(self) -> dict:
+        hardware = self.hardware()
+        with self._lock:
+            running = sum(1 for job in self.jobs.values() if job.state == "running")
+            return {
+                **hardware,
+                "free_gpus": len(self._free_devices),
+                "free_cpu_slots": self.max_cpu_jobs - self._cpu_running,
+                "max_cpu_jobs": self.max_cpu_jobs,
+                "running": running,
+                "jobs": {job_id: job.state for job_id, job in self.jobs.items()},
+            }
+
+    def _job_path(self, job: RemoteJob, rel: str) -> str:
+        path = os.path.normpath(os.path.join(job.workdir, rel))
+        if os.path.isabs(rel) or not path.startswith(job.workdir + os.sep):
+            raise ValueError(f"Path {rel} is outside the job folder")
+        return path
+
+    def create_job(self, spec: dict) -> RemoteJob:
+        name = re.sub(r"[^A-Za-z0-9_.-]", "_", str(spec.get("name") or "job"))
+        job_id = f"{next(self._ids)}-{int(time.time())}"
+        workdir = os.path.join(self.root, f"{job_id}_{name}")
+        os.makedirs(workdir)
+        job = RemoteJob(job_id, spec, workdir)
+        with self._lock:
+            self.jobs[job_id] = job
+        self.status_store.register(job_id, name)
+        self.status_store.update(job_id, state="queued", stage="Uploading")
+        self.logger.info(f"📥 Job {job_id} ({name}) created in {workdir}")
+        return job
+
+    def write_chunk(self, job: RemoteJob, rel: str, offset: int, data: bytes) -> int:
+        if job.state != "uploading":
+            raise RuntimeError(f"Job {job.job_id} is {job.state}, uploads are closed")
+        path = self._job_path(job, rel)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'r+b' if offset and os.path.exists(path) else 'wb') as f:
+            f.seek(offset)
+            f.write(data)
+            f.truncate()
+        return offset + len(data)
+
+    def read_chunk(self, job: RemoteJob, rel: str, offset: int, length: int) -> bytes:
+        with open(self._job_path(job, rel), 'rb') as f:
+            f.seek(offset)
+            return f.read(min(length, self.CHUNK_SIZE))
+
+    def manifest(self, job: RemoteJob) -> list:
+        files = []
+        for root, _, names in os.walk(job.workdir):
+            for name in names:
+                path = os.path.join(root, name)
+                files.append({"path": os.path.relpath(path, job.workdir).replace(os.sep, "/"),
+                              "size": os.path.getsize(path), "sha256": ScratchStager.checksum(path)})
+        return files
+
+    def start_job(self, job: RemoteJob, manifest: list) -> list:
+        mismatched = [entry["path"] for entry in manifest
+                      if not os.path.exists(self._job_path(job, entry["path"]))
+                      or ScratchStager.checksum(self._job_path(job, entry["path"])) != entry["sha256"]]
+        if mismatched:
+            return mismatched
+
+        spec = job.spec
+        engine = spec.get("engine", "CUDA")
+        num_gpus = int(spec.get("num_gpus", 1)) if engine == "CUDA" else 0
+        with self._lock:
+            if engine == "CUDA":
+                if len(self._free_devices) < num_gpus:
+                    raise AgentBusy(f"Only {len(self._free_devices)} free GPUs, job needs {num_gpus}")
+                job.devices = self._free_devices[:num_gpus]
+                del self._free_devices[:num_gpus]
+            else:
+                if self._cpu_running >= self.max_cpu_jobs:
+                    raise AgentBusy("No free CPU job slot")
+                self._cpu_running += 1
+            job.state = "running"
+
+        options = {key: spec[key] for key in self.JOB_OPTIONS if key in spec}
+        worker = SimulationWorker(job.workdir, num_gpus, int(spec.get("num_cores", 0)), float(spec["duration"]),
+                                  spec.get("unit", "ns"), engine, device_ids=job.devices or None,
+                                  scratch_root=self.scratch_root, status_store=self.status_store,
+                                  job_id=job.job_id, gmx_folder=self.gmx_folder, **options)
+        worker.signals.finished.connect(lambda job=job: self._on_finished(job), type=Qt.ConnectionType.DirectConnection)
+        job.worker = worker
+        self.logger.info(f"▶️ Starting job {job.job_id} on devices {job.devices}")
+        # No Qt event loop is needed: every worker signal the agent uses is directly connected
+        threading.Thread(target=worker.run, name=f"RemoteJob-{job.job_id}", daemon=True).start()
+        return []
+
+    def _on_finished(self, job: RemoteJob) -> None:
+        with self._lock:
+            if job.spec.get("engine", "CUDA") == "CUDA":
+                self._free_devices.extend(job.devices)
+                self._free_devices.sort(key=self.gpu_devices.index)
+                job.devices = []
+            else:
+                self._cpu_running -= 1
+            job.error = job.worker.error
+            if job.error:
+                job.state = "cancelled" if job.cancel_requested else "failed"
+            else:
+                job.state = "finished"
+        self.logger.info(f"🏁 Job {job.job_id} {job.state}")
+
+    def cancel(self, job: RemoteJob) -> None:
+        job.cancel_requested = True
+        if job.state == "running" and job.worker:
+            job.worker.interrupt()
+        elif job.state == "uploading":
+            job.state = "cancelled"
+            self.status_store.update(job.job_id, state="cancelled")
+
+    def delete(self, job: RemoteJob) -> None:
+        if job.state == "running":
+            raise RuntimeError(f"Job {job.job_id} is still running")
+        with self._lock:
+            self.jobs.pop(job.job_id, None)
+        shutil.rmtree(job.workdir, ignore_errors=True)
+        self.logger.info(f"🧹 Removed job {job.job_id}")
+
+    def events(self, job: RemoteJob, version: int, log_since: int, wait: float) -> dict:
+        # Long poll: return as soon as the job's record changes or the wait runs out
+        deadline = time.time() + min(wait, 30.0)
+        while True:
+            _, records = self.status_store.changed_since(version)
+            record = next((r for r in records if r["job_id"] == job.job_id), None)
+            total, lines = self.status_store.log(job.job_id, log_since)
+            if record or lines or job.state in StatusStore.FINAL_STATES or time.time() >= deadline:
+                break
+            time.sleep(0.25)
+        if record is None:
+            _, records = self.status_store.changed_since(0)
+            record = next(r for r in records if r["job_id"] == job.job_id)
+        return {"state": job.state, "error": job.error, "record": record, "log_total": total, "log": lines}
+
+    def make_handler(self):
+        agent = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                agent.logger.debug(f"{self.address_string()} {format % args}")
+
+            def reply(self, status: int, payload=None, body: bytes = None):
+                if body is None:
+                    body = json.dumps(payload if payload is not None else {}).encode()
+                    content_type = "application/json"
+                else:
+                    content_type = "application/octet-stream"
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def body(self) -> bytes:
+                return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+            def dispatch(self, method: str):
+                url = urlparse(self.path)
+                query = {key: values[0] for key, values in parse_qs(url.query).items()}
+                if agent.token and not hmac.compare_digest(self.headers.get("X-Gmxauto-Token", ""), agent.token):
+                    self.reply(401, {"error": "invalid token"})
+                    return
+                parts = [part for part in url.path.split("/") if part]
+                try:
+                    if parts == ["info"] and method == "GET":
+                        self.reply(200, agent.info())
+                        return
+                    if parts == ["jobs"] and method == "POST":
+                        job = agent.create_job(json.loads(self.body()))
+                        self.reply(201, {"job_id": job.job_id})
+                        return
+                    job = agent.jobs.get(parts[1]) if len(parts) >= 2 and parts[0] == "jobs" else None
+                    if job is None:
+                        self.reply(404, {"error": f"unknown path {url.path}"})
+                        return
+                    action = parts[2] if len(parts) > 2 else None
+                    if action == "files" and method == "PUT":
+                        offset = agent.write_chunk(job, query["path"], int(query.get("offset", 0)), self.body())
+                        self.reply(200, {"offset": offset})
+                    elif action == "files" and method == "GET":
+                        data = agent.read_chunk(job, query["path"], int(query.get("offset", 0)),
+                                                int(query.get("length", agent.CHUNK_SIZE)))
+                        self.reply(200, body=data)
+                    elif action == "start" and method == "POST":
+                        mismatched = agent.start_job(job, json.loads(self.body())["manifest"])
+                        self.reply(409 if mismatched else 200, {"mismatched": mismatched})
+                    elif action == "events" and method == "GET":
+                        self.reply(200, agent.events(job, int(query.get("version", 0)),
+                                                     int(query.get("log_since", 0)), float(query.get("wait", 10))))
+                    elif action == "manifest" and method == "GET":
+                        self.reply(200, {"files": agent.manifest(job)})
+                    elif action == "cancel" and method == "POST":
+                        agent.cancel(job)
+                        self.reply(200, {"state": job.state})
+                    elif action is None and method == "DELETE":
+                        agent.delete(job)
+                        self.reply(200, {})
+                    else:
+                        self.reply(404, {"error": f"unknown path {url.path}"})
+                except (KeyError, ValueError) as e:
+                    self.reply(400, {"error": str(e)})
+                except AgentBusy as e:
+                    self.reply(503, {"error": str(e)})
+                except (RuntimeError, OSError) as e:
+                    self.reply(409, {"error": str(e)})
+
+            def do_GET(self):
+                self.dispatch("GET")
+
+            def do_POST(self):
+                self.dispatch("POST")
+
+            def do_PUT(self):
+                self.dispatch("PUT")
+
+            def do_DELETE(self):
+                self.dispatch("DELETE")
+
+        return Handler
+
+    def start(self) -> None:
+        if not self.token and not self.is_loopback(self.host):
+            raise ValueError(f"Refusing to listen on {self.host} without a token: anyone on the network could "
+                             f"upload and run jobs. Set --token or GMXAUTO_AGENT_TOKEN, or bind to 127.0.0.1")
+        self.server = ThreadingHTTPServer((self.host, self.port), self.make_handler())
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        threading.Thread(target=self.server.serve_forever, name="RemoteAgent", daemon=True).start()
+        self.logger.info(f"🛰️ Agent listening on http://{self.host}:{self.port} "
+                         f"({len(self.gpu_devices)} GPUs, {self.max_cpu_jobs} CPU slots, root {self.root})")
+
+    def stop(self) -> None:
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+        for job in list(self.jobs.values()):
+            if job.state == "running" and job.worker:
+                job.worker.interrupt()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="gmxauto remote worker agent")
+    parser.add_argument("--root", default=os.path.join(os.path.expanduser("~"), "gmxauto_agent"),
+                        help="folder that receives job inputs")
+    parser.add_argument("--host", default="127.0.0.1",
+                        help="address to listen on (0.0.0.0 for the lab network, requires --token)")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--gpus", help="comma-separated GPU indices to offer (default: all detected)")
+    parser.add_argument("--max-cpu-jobs", type=int, default=1)
+    parser.add_argument("--token", default=os.environ.get("GMXAUTO_AGENT_TOKEN"),
+                        help="shared secret the controller must send")
+    parser.add_argument("--gmx-folder", help="GROMACS install to use instead of the bundled one")
+    parser.add_argument("--scratch-root", help="stage job folders on this local scratch disk")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s: %(message)s")
+    gpus = [int(g) for g in args.gpus.split(",") if g.strip()] if args.gpus is not None else None
+    agent = RemoteAgent(args.root, args.host, args.port, gpus, args.max_cpu_jobs, args.token,
+                        args.gmx_folder, args.scratch_root)
+    try:
+        agent.start()
+    except ValueError as e:
+        agent.logger.error(f"❌ {e}")
+        return 2
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        agent.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,169 @@
+import os
+import shutil
+import hashlib
+import logging
+import tempfile
+import threading
+
+class ScratchStager:
+    logger = logging.getLogger("ScratchStager")
+
+    # mdrun only ever appends to these, so the write-back can copy just the new bytes
+    APPEND_SUFFIXES = (".xtc", ".trr", ".edr", ".log", ".txt")
+    CHUNK_SIZE = 4 * 1024 * 1024
+    copy_file = staticmethod(shutil.copy2)  # used for stage-in
+
+    def __init__(self, workdir: str, scratch_root: str = None, interval: float = 30.0, cleanup: bool = True):
+        self.workdir = os.path.abspath(workdir)
+        self.scratch_root = scratch_root or self.default_scratch_root()
+        self.interval = interval
+        self.cleanup = cleanup
+        self.scratch_dir = None
+        self._synced = {}   # relative path -> (size, mtime, offset, running hash)
+        self._inputs = set()  # files that came from the working folder rather than from the run
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def default_scratch_root() -> str:
+        if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK):
+            return "/dev/shm"
+        return tempfile.gettempdir()
+
+    @staticmethod
+    def checksum(path: str) -> str:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(ScratchStager.CHUNK_SIZE), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def stage_in(self) -> str:
+        os.makedirs(self.scratch_root, exist_ok=True)
+        name = os.path.basename(self.workdir.rstrip(os.sep)) or "job"
+        self.scratch_dir = tempfile.mkdtemp(prefix=f"gmxauto_{name}_", dir=self.scratch_root)
+        try:
+            shutil.copytree(self.workdir, self.scratch_dir, dirs_exist_ok=True, copy_function=self.copy_file)
+        except Exception:
+            # A partial copy (e.g. scratch full) must never be written back over the originals
+            shutil.rmtree(self.scratch_dir, ignore_errors=True)
+            self.scratch_dir = None
+            raise
+        # Files copied in are already in sync with the working folder
+        for rel in self._files():
+            path = os.path.join(self.scratch_dir, rel)
+            st = os.stat(path)
+            self._synced[rel] = (st.st_size, st.st_mtime, st.st_size, None)
+            self._inputs.add(rel)
+        self.logger.info(f"🚚 Staged {len(self._synced)} files from {self.workdir} to {self.scratch_dir}")
+        return self.scratch_dir
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._loop, name="ScratchStager", daemon=True)
+        self._thread.start()
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.sync()
+            except Exception as e:
+                self.logger.warning(f"⚠️ Background write-back failed, retrying next cycle: {e}")
+
+    def _files(self):
+        for root, _, names in os.walk(self.scratch_dir):
+            for name in names:
+                yield os.path.relpath(os.path.join(root, name), self.scratch_dir)
+
+    def _copy_range(self, rel: str, offset: int, digest) -> int:
+        src = os.path.join(self.scratch_dir, rel)
+        dst = os.path.join(self.workdir, rel)
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        with open(src, 'rb') as fin, open(dst, 'r+b' if offset and os.path.exists(dst) else 'wb') as fout:
+            fin.seek(offset)
+            fout.seek(offset)
+            fout.truncate()
+            for chunk in iter(lambda: fin.read(self.CHUNK_SIZE), b""):
+                fout.write(chunk)
+                digest.update(chunk)
+                offset += len(chunk)
+            fout.flush()
+            os.fsync(fout.fileno())
+        return offset
+
+    def _sync_file(self, rel: str) -> bool:
+        src = os.path.join(self.scratch_dir, rel)
+        try:
+            st = os.stat(src)
+        except FileNotFoundError:
+            return False
+        size, mtime, offset, digest = self._synced.get(rel, (None, None, 0, None))
+        if (st.st_size, st.st_mtime) == (size, mtime):
+            return False
+
+        appendable = rel.endswith(self.APPEND_SUFFIXES) and digest is not None and st.st_size >= offset
+        if not appendable:
+            offset, digest = 0, hashlib.sha256()
+        offset = self._copy_range(rel, offset, digest)
+        self._synced[rel] = (st.st_size, st.st_mtime, offset, digest)
+        return True
+
+    def _remove_deleted(self, present: set) -> int:
+        # Mirror deletions (e.g. mdrun backups, smoke-test outputs) of files the run wrote, never of inputs
+        removed = 0
+        for rel in [rel for rel in self._synced if rel not in present]:
+            self._synced.pop(rel)
+            if rel in self._inputs:
+                continue
+            try:
+                os.remove(os.path.join(self.workdir, rel))
+                removed += 1
+            except FileNotFoundError:
+                pass
+        return removed
+
+    def sync(self) -> int:
+        with self._lock:
+            present = set(self._files())
+            copied = sum(1 for rel in present if self._sync_file(rel))
+            removed = self._remove_deleted(present)
+        if copied or removed:
+            self.logger.debug(f"🔁 Wrote back {copied} files and removed {removed} from {self.workdir}")
+        return copied
+
+    def verify(self) -> list:
+        # The running digest covers exactly the bytes written to the working folder, so comparing it with
+        # a hash of the scratch copy proves the write-back without reading anything back from the share
+        mismatched = []
+        for rel in self._files():
+            src = os.path.join(self.scratch_dir, rel)
+            dst = os.path.join(self.workdir, rel)
+            size, mtime, offset, digest = self._synced.get(rel, (None, None, 0, None))
+            st = os.stat(src)
+            if (st.st_size, st.st_mtime) != (size, mtime):
+                mismatched.append(rel)
+            elif digest is None:
+                continue  # staged in and never modified
+            elif (offset != size or not os.path.exists(dst) or os.path.getsize(dst) != size
+                  or digest.hexdigest() != self.checksum(src)):
+                mismatched.append(rel)
+        return mismatched
+
+    def finish(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        self.sync()
+        mismatched = self.verify()
+        if mismatched:
+            # Appended copies can diverge if mdrun truncated a file (e.g. -append after a restart)
+            with self._lock:
+                for rel in mismatched:
+                    self._synced.pop(rel, None)
+                    self._sync_file(rel)
+            mismatched = self.verify()
+        if mismatched:
+            raise IOError(f"Checksum mismatch after write-back: {', '.join(mismatched)}")
+        self.logger.info(f"✅ Write-back verified ({self.scratch_dir} → {self.workdir})")
+        if self.cleanup:
+            shutil.rmtree(self.scratch_dir, ignore_errors=True)
@@ -1,23 +1,39 @@
 import os
+import re
+import glob
 import time
+import shutil
 import logging
 import subprocess
+from collections import deque
 
-from PyQt6.QtCore import QObject, pyqtSignal, QRunnable
+from PyQt6.QtCore import Qt, QObject, pyqtSignal, QRunnable
 
 from environment_manager import EnvironmentManager
 from mdp_file_manager import MDPFileManager
-from command_runner import CommandRunner
+from command_runner import CommandRunner, SimulationPreempted
 from gpu_command_builder import GPUCommandBuilder
+from process_backend import ProcessBackend
+from convergence_monitor import ConvergenceMonitor
+from topology_processor import TopologyProcessor
+from scratch_stager import ScratchStager
+from io_planner import IOBudgetPlanner
 
 class WorkerSignals(QObject):
     progress = pyqtSignal(int, str)  # progress percent, step name
     log = pyqtSignal(str, str)       # level, message
     step_finished = pyqtSignal(str)  # step name
     finished = pyqtSignal()
+    parked = pyqtSignal()            # production checkpointed and exited for preemption
 
 class SimulationWorker(QRunnable):
-    def __init__(self, workdir, num_gpus, num_cores, duration, unit, engine):
+    RATE_WINDOW = 30.0  # seconds of progress samples behind steps_per_second
+    OUTPUT_INTERVALS = ("nstxout", "nstvout", "nstfout", "nstxout-compressed", "nstenergy", "nstlog", "nstcalcenergy")
+
+    def __init__(self, workdir, num_gpus, num_cores, duration, unit, engine, backend=None, device_ids=None,
+                 adaptive_equilibration=False, convergence_options=None, hmr_factor=None,
+                 hmr_timestep=0.004, hmr_smoke_steps=5000, scratch_root=None, status_store=None, job_id=None,
+                 gmx_folder=None, io_budget=None, isolation=None):
         super().__init__()
         self.workdir = workdir
         self.num_gpus = num_gpus
@@ -25,13 +41,59 @@ class SimulationWorker(QRunnable):
         self.duration = duration
         self.unit = unit
         self.engine = engine
+        self.backend = backend
+        self.device_ids = device_ids
+        self.adaptive_equilibration = adaptive_equilibration
+        self.convergence_options = convergence_options or {}
+        self.hmr_factor = hmr_factor
+        self.hmr_timestep = hmr_timestep
+        self.hmr_smoke_steps = hmr_smoke_steps
+        self.topology = "topol.top"
+        self.scratch_root = scratch_root
+        self.status_store = status_store
+        self.job_id = job_id if job_id is not None else workdir
+        self.gmx_folder = gmx_folder
+        self.io_budget = io_budget
+        self.isolation = isolation or {}  # LinuxProcessBackend options: reserved_cores, nice, io_class, ...
+        self.env = None
+        self.error = None
+        self.preemptible = False
         self.signals = WorkerSignals()
         self.logger = logging.getLogger("SimulationHelper")
         self._is_interrupted = False
+        self._preempt_requested = False
+        if status_store is not None:
+            status_store.register(self.job_id, os.path.basename(os.path.normpath(workdir)))
+            # Direct connections run in the worker thread, so status updates never touch the GUI event loop
+            self.signals.progress.connect(self._store_progress, type=Qt.ConnectionType.DirectConnection)
+            self.signals.log.connect(self._store_log, type=Qt.ConnectionType.DirectConnection)
+
+    def _store_progress(self, percent, step_name):
+        self.status_store.update(self.job_id, stage=step_name, percent=float(percent))
+
+    def _store_log(self, level, message):
+        self.status_store.append_log(self.job_id, level, message)
+
+    def _set_state(self, state: str, **fields):
+        if self.status_store is not None:
+            self.status_store.update(self.job_id, state=state, **fields)
 
     def interrupt(self):
         self._is_interrupted = True
 
+    def preempt(self):
+        self._preempt_requested = True
+
+    def path(self, file_name: str) -> str:
+        return os.path.join(self.workdir, file_name)
+
+    @property
+    def production_mdp(self) -> str:
+        # HMR settings live in their own copy, like topol_hmr.top, so the user's MDP stays at its own dt
+        if self.hmr_factor and os.path.exists(self.path("step5_production_hmr.mdp")):
+            return "step5_production_hmr.mdp"
+        return "step5_production.mdp"
+
     def calculate_nsteps(self, timestep_ps: float) -> int:
         if self.unit == "ns":
             total_ps = self.duration * 1000
@@ -44,9 +106,9 @@ class SimulationWorker(QRunnable):
 
         nsteps = int(total_ps / timestep_ps)
 
-        nsteps_mdp = MDPFileManager.read_nsteps("step5_production.mdp")
+        nsteps_mdp = MDPFileManager.read_nsteps(self.path(self.production_mdp))
         if nsteps_mdp is None or int(nsteps) != int(nsteps_mdp):
-            MDPFileManager.write_nsteps("step5_production.mdp", nsteps)
+            MDPFileManager.write_nsteps(self.path(self.production_mdp), nsteps)
 
         self.signals.log.emit("INFO", f"⏳ Duration {self.duration}{self.unit} → dt = {timestep_ps} ps → nsteps = {nsteps}")
         self.logger.info(f"Duration {self.duration}{self.unit} → dt = {timestep_ps} ps → nsteps = {nsteps}")
@@ -54,7 +116,7 @@ class SimulationWorker(QRunnable):
         return nsteps
 
     def check_file_exists(self, file_path: str, step_name: str):
-        if os.path.exists(file_path):
+        if os.path.exists(self.path(file_path)):
             self.signals.log.emit("SUCCESS", f"✅ {file_path} successfully created at {step_name}")
             self.logger.info(f"File {file_path} found after {step_name}")
         else:
@@ -62,13 +124,118 @@ class SimulationWorker(QRunnable):
             self.logger.error(f"File {file_path} not found after {step_name}")
             raise FileNotFoundError(f"{file_path} not found after {step_name}")
 
+    def prepare_hmr(self):
+        step_name = "Hydrogen Mass Repartitioning"
+        self.signals.log.emit("INFO", f"⚖️ Repartitioning hydrogen masses (factor {self.hmr_factor})")
+        topology = TopologyProcessor.repartition(self.path("topol.top"), self.hmr_factor)
+        self.topology = os.path.relpath(topology, self.workdir)
+
+        production_mdp = self.path("step5_production_hmr.mdp")
+        shutil.copyfile(self.path("step5_production.mdp"), production_mdp)
+        constraints = (MDPFileManager.read_parameter(production_mdp, "constraints") or "none").lower()
+        if constraints not in ("h-bonds", "all-bonds"):
+            self.signals.log.emit("WARNING", f"⚠️ constraints = {constraints} is unsafe at {self.hmr_timestep} ps, using h-bonds")
+            MDPFileManager.write_parameter(production_mdp, "constraints", "h-bonds")
+        old_dt = MDPFileManager.extract_dt(production_mdp)
+        MDPFileManager.write_parameter(production_mdp, "dt", self.hmr_timestep)
+        self.rescale_output_intervals(production_mdp, old_dt / self.hmr_timestep)
+        self.calculate_nsteps(self.hmr_timestep)
+        self.signals.log.emit("SUCCESS", f"✅ Success: {step_name} → {self.topology}, {self.production_mdp}")
+
+    def plan_output_io(self):
+        step_name = "Output I/O Planning"
+        options = dict(self.io_budget)
+        apply = options.pop("apply", True)
+        disk_speed = options.pop("disk_speed", None)
+        measure_disk_speed = options.pop("measure_disk_speed", False)
+        if isinstance(options.get("storage_budget"), str):
+            options["storage_budget"] = IOBudgetPlanner.parse_size(options["storage_budget"])
+
+        planner = IOBudgetPlanner(self.workdir, mdp_name=self.production_mdp)
+        eq_dt = MDPFileManager.extract_dt(self.path("step4.1_equilibration.mdp"))
+        steps_per_second = IOBudgetPlanner.steps_per_second_from_log(self.path("step4.1_equilibration.log"), eq_dt)
+        if steps_per_second is None:
+            self.signals.log.emit("WARNING", f"⚠️ {step_name} skipped: no performance line in the equilibration log")
+            return
+        if isinstance(disk_speed, str):
+            disk_speed = IOBudgetPlanner.parse_size(disk_speed)
+        elif disk_speed is None and measure_disk_speed:
+            disk_speed = IOBudgetPlanner.measure_write_speed(self.workdir)
+        if disk_speed is None and options.get("storage_budget") is None:
+            self.signals.log.emit("WARNING", f"⚠️ {step_name} skipped: neither a disk speed nor a storage budget is set")
+            return
+
+        total_ps = self.duration * 1000 if self.unit == "ns" else self.duration
+        plan = planner.plan(total_ps, steps_per_second, disk_speed, **options)
+        for line in planner.describe(plan).splitlines():
+            self.signals.log.emit("INFO", f"💽 {line.strip()}")
+        if not plan["changes"]:
+            self.signals.log.emit("SUCCESS", f"✅ Success: {step_name} (output settings already within budget)")
+        elif apply:
+            planner.apply(plan)
+            self.signals.log.emit("SUCCESS", f"✅ Success: {step_name} → {len(plan['changes'])} output settings updated")
+        else:
+            self.signals.log.emit("WARNING", f"⚠️ {step_name}: suggested changes not applied")
+        if not plan["fits"]:
+            self.signals.log.emit("WARNING", "⚠️ Production output still exceeds the I/O budget")
+
+    def rescale_output_intervals(self, mdp_path: str, ratio: float):
+        # Output intervals are step counts, so keep them fixed in ps when dt changes
+        if abs(ratio - 1.0) < 1e-9:
+            return
+        intervals = {}
+        for key in self.OUTPUT_INTERVALS:
+            value = MDPFileManager.read_parameter(mdp_path, key)
+            if value and int(float(value)) > 0:
+                intervals[key] = max(int(round(int(float(value)) * ratio)), 1)
+        calc = intervals.get("nstcalcenergy")
+        if calc and intervals.get("nstenergy"):
+            intervals["nstenergy"] = max(intervals["nstenergy"] // calc, 1) * calc
+        for key, value in intervals.items():
+            MDPFileManager.write_parameter(mdp_path, key, value)
+        if intervals:
+            summary = ", ".join(f"{key} = {value}" for key, value in intervals.items())
+            self.signals.log.emit("INFO", f"⏱️ Output intervals rescaled for dt = {self.hmr_timestep} ps: {summary}")
+
+    def run_hmr_smoke_test(self, gpu_ids):
+        step_name = "HMR Stability Test"
+        cmd = GPUCommandBuilder.build(
+            f"gmx mdrun -v -s step5_1.tpr -deffnm step5_hmr_smoke -nsteps {self.hmr_smoke_steps}",
+            self.num_gpus, self.num_cores, gpu_ids, self.engine
+        )
+        output_file = self.path(f"output_{step_name.replace(' ', '_')}.txt")
+        self.signals.log.emit("INFO", f"🧪 Running {self.hmr_smoke_steps}-step stability test at dt = {self.hmr_timestep} ps")
+
+        def read_output():
+            try:
+                with open(output_file, 'r', errors='replace') as f:
+                    return f.read()
+            except OSError:
+                return ""
+
+        def check_constraints():
+            output = read_output()
+            if "LINCS WARNING" in output or "can not be settled" in output:
+                raise RuntimeError(f"{step_name} reported constraint warnings at dt = {self.hmr_timestep} ps")
+
+        try:
+            self.run_mdrun_with_progress(cmd, step_name, total_nsteps=self.hmr_smoke_steps, verify=check_constraints)
+        except subprocess.CalledProcessError:
+            raise RuntimeError(f"{step_name} crashed, the repartitioned system is not stable at "
+                               f"dt = {self.hmr_timestep} ps: {read_output().strip()[-500:]}")
+        finally:
+            for smoke_file in glob.glob(self.path("step5_hmr_smoke*")) + [output_file]:
+                if os.path.exists(smoke_file):
+                    os.remove(smoke_file)
+        self.logger.info(f"{step_name} passed")
+
     def run_command(self, command, step_name):
         self.signals.log.emit("COMMAND", f"$ {command}")
         if self._is_interrupted:
             self.signals.log.emit("WARNING", f"⚠️ Step {step_name} cancelled before start.")
             raise RuntimeError(f"Step {step_name} cancelled.")
         try:
-            CommandRunner.run_command(command)
+            CommandRunner.run_command(command, self.backend, cwd=self.workdir, env=self.env)
             self.signals.log.emit("SUCCESS", f"✅ Success: {step_name}")
             self.logger.info(f"Step {step_name} completed successfully")
         except subprocess.CalledProcessError as e:
@@ -76,7 +243,7 @@ class SimulationWorker(QRunnable):
             self.logger.error(f"Step {step_name} failed: {e.stderr if e.stderr else str(e)}")
             raise
 
-    def run_mdrun_with_progress(self, command, step_name):
+    def run_mdrun_with_progress(self, command, step_name, check_stop=None, total_nsteps=None, verify=None):
         self.signals.log.emit("COMMAND", f"$ {command}")
 
         def update_progress(val):
@@ -88,8 +255,52 @@ class SimulationWorker(QRunnable):
         def check_interrupted():
             return self._is_interrupted
 
+        def check_preempt():
+            return self.preemptible and self._preempt_requested
+
+        mdp = {"step4.1": "step4.1_equilibration.mdp", "step5_1": self.production_mdp}
+        mdp_file = next((f for key, f in mdp.items() if key in command), None)
+        dt = MDPFileManager.extract_dt(self.path(mdp_file)) if mdp_file and self.status_store is not None else None
+        deffnm = re.search(r"-deffnm\s+(\S+)", command)
+        checkpoint = self.path(f"{deffnm.group(1)}.cpt") if deffnm else None
+        started = {}
+        samples = deque()
+
+        def update_status(current, total):
+            if self.status_store is None:
+                return
+            now = time.time()
+            if started:
+                # Time spent in one monitor loop iteration beyond its poll sleep
+                self.status_store.observe_loop(max(now - started["tick"] - CommandRunner.POLL_INTERVAL, 0.0))
+            else:
+                started.update(time=now, step=current)
+            started["tick"] = now
+            samples.append((now, current))
+            while len(samples) > 1 and samples[1][0] <= now - self.RATE_WINDOW:
+                samples.popleft()
+            fields = {"stage": step_name, "percent": min(current / total * 100, 99.9), "step": current}
+            since, step_then = samples[0]
+            if now > since:
+                # Recent rate for stall detection, whole-stage average for the smoother ns/day and ETA
+                fields["steps_per_second"] = (current - step_then) / (now - since)
+            elapsed = now - started["time"]
+            average = (current - started["step"]) / elapsed if elapsed > 0 else 0
+            if average > 0:
+                fields.update(ns_per_day=average * dt * 86400 / 1000 if dt else None, eta=(total - current) / average)
+            try:
+                fields["last_checkpoint"] = os.path.getmtime(checkpoint) if checkpoint else None
+            except OSError:
+                pass
+            self.status_store.update(self.job_id, **fields)
+
         try:
-            CommandRunner.run_mdrun_with_progress(command, step_name, update_progress, update_log, check_interrupted)
+            CommandRunner.run_mdrun_with_progress(command, step_name, update_progress, update_log, check_interrupted,
+                                                 self.backend, cwd=self.workdir, env=self.env,
+                                                 check_preempt_callback=check_preempt, check_stop_callback=check_stop,
+                                                 update_status_callback=update_status, total_nsteps=total_nsteps)
+            if verify:
+                verify()
             self.signals.progress.emit(100, step_name)
             self.signals.log.emit("SUCCESS", f"✅ Success: {step_name}")
             self.logger.info(f"Step {step_name} completed successfully")
@@ -97,22 +308,69 @@ class SimulationWorker(QRunnable):
             self.signals.log.emit("ERROR", f"❌ Failed {step_name}: {e.stderr if e.stderr else str(e)}")
             self.logger.error(f"Step {step_name} failed: {e.stderr if e.stderr else str(e)}")
             raise
+        except SimulationPreempted as e:
+            self.signals.log.emit("WARNING", f"⏸️ {str(e)}")
+            self.logger.info(str(e))
+            raise
         except RuntimeError as e:
             self.signals.log.emit("WARNING", f"⚠️ {str(e)}")
             self.logger.warning(str(e))
             raise
 
     def run(self):
+        original_workdir = self.workdir
+        stager = None
+        outcome = "finished"
+        self._set_state("running")
         try:
-            os.chdir(self.workdir)
-            self.signals.log.emit("INFO", f"📂 Changed working directory to: {self.workdir}")
-            self.logger.info(f"Changed directory to: {self.workdir}")
+            if self.scratch_root:
+                # Only a completed stage-in may be written back, a failed one removes its scratch copy
+                staging = ScratchStager(self.workdir, self.scratch_root)
+                self.workdir = staging.stage_in()
+                stager = staging
+                self.signals.log.emit("INFO", f"🚚 Staged inputs to scratch: {self.workdir}")
+                stager.start()
+            outcome = self.run_pipeline()
+        except Exception as e:
+            self.error = str(e)
+            self.signals.log.emit("ERROR", f"❌ Error: {str(e)}")
+            self.logger.error(f"Error: {str(e)}")
+        finally:
+            if self.backend:
+                self.backend.close()
+            if stager:
+                self.signals.log.emit("INFO", "🚚 Writing outputs back to working folder...")
+                try:
+                    stager.finish()
+                    self.signals.log.emit("SUCCESS", f"✅ Outputs synced to {original_workdir}")
+                except Exception as e:
+                    self.error = self.error or str(e)
+                    self.signals.log.emit("ERROR", f"❌ Write-back failed, outputs kept in {stager.scratch_dir}: {str(e)}")
+                    self.logger.error(f"Write-back failed: {str(e)}")
+                self.workdir = original_workdir
 
-            env_manager = EnvironmentManager(self.num_gpus, self.engine)
-            env_manager.setup()
+        if outcome == "parked":
+            self._set_state("parked", eta=None)
+            self.signals.parked.emit()
+        else:
+            if self.error:
+                self._set_state("cancelled" if self._is_interrupted else "failed", eta=None)
+            else:
+                self._set_state("finished", percent=100.0, eta=None)
+            self.signals.finished.emit()
+
+    def run_pipeline(self) -> str:
+        try:
+            self.signals.log.emit("INFO", f"📂 Working directory: {self.workdir}")
+            self.logger.info(f"Working directory: {self.workdir}")
+
+            env_manager = EnvironmentManager(self.num_gpus, self.engine, self.device_ids, self.gmx_folder)
+            self.env = env_manager.build_env()
             gpu_ids = env_manager.gpu_ids
+            if self.backend is None:
+                self.backend = ProcessBackend.create(num_cores=self.num_cores, **self.isolation)
 
-            checkpoint_exists = os.path.exists("step5_1.cpt")
+            checkpoint_exists = os.path.exists(self.path("step5_1.cpt"))
             if checkpoint_exists:
                 self.signals.log.emit("WARNING", "⚠️ Checkpoint found, skipping Steps 1-5...")
                 self.logger.info("Checkpoint found, skipping Steps 1-5")
@@ -128,21 +386,24 @@ class SimulationWorker(QRunnable):
                     if self._is_interrupted:
                         self.signals.log.emit("WARNING", "⚠️ Simulation cancelled by user.")
                         self.logger.warning("Simulation cancelled by user.")
-                        self.signals.finished.emit()
-                        return
+                        self.error = "Simulation cancelled by user."
+                        return "finished"
                     self.signals.progress.emit(100, step_name)
                     self.signals.log.emit("SUCCESS", f"✅ Success: {step_name} (skipped due to checkpoint)")
-                    if not os.path.exists(check_file):
+                    if not os.path.exists(self.path(check_file)):
                         self.signals.log.emit("WARNING", f"⚠️ File {check_file} not found after {step_name} (skipped)")
                         self.logger.warning(f"File {check_file} not found after {step_name} (skipped)")
                     time.sleep(0.1)
 
             else:
+                if self.hmr_factor:
+                    self.prepare_hmr()
+
                 # Step 1
                 step_name = "Step 1: Preprocessing Minimization"
                 if self._is_interrupted: raise RuntimeError("Simulation cancelled by user.")
                 cmd1 = ("gmx grompp -f step4.0_minimization.mdp -o step4.0_minimization.tpr "
-                        "-c step3_input.gro -r step3_input.gro -p topol.top -n index.ndx -maxwarn 1")
+                        f"-c step3_input.gro -r step3_input.gro -p {self.topology} -n index.ndx -maxwarn 1")
                 self.run_command(cmd1, step_name)
                 self.check_file_exists("step4.0_minimization.tpr", step_name)
                 self.signals.progress.emit(100, step_name)
@@ -161,7 +422,7 @@ class SimulationWorker(QRunnable):
                 step_name = "Step 3: Preprocessing Equilibration"
                 if self._is_interrupted: raise RuntimeError("Simulation cancelled by user.")
                 cmd3 = ("gmx grompp -f step4.1_equilibration.mdp -o step4.1_equilibration.tpr "
-                        "-c step4.0_minimization.gro -r step3_input.gro -p topol.top -n index.ndx -maxwarn 1")
+                        f"-c step4.0_minimization.gro -r step3_input.gro -p {self.topology} -n index.ndx -maxwarn 1")
                 self.run_command(cmd3, step_name)
                 self.check_file_exists("step4.1_equilibration.tpr", step_name)
                 self.signals.progress.emit(100, step_name)
@@ -173,26 +434,51 @@ class SimulationWorker(QRunnable):
                     f"gmx mdrun -v -deffnm step4.1_equilibration",
                     self.num_gpus, self.num_cores, gpu_ids, self.engine
                 )
-                self.run_mdrun_with_progress(cmd4, step_name)
+                check_stop = None
+                if self.adaptive_equilibration and not self.backend.can_request_checkpoint:
+                    # Stopping would kill mdrun without a final .gro, so run the full equilibration instead
+                    self.signals.log.emit("WARNING", "⚠️ Adaptive equilibration needs a clean mdrun stop, which this "
+                                                     "platform cannot request; running the full equilibration")
+                elif self.adaptive_equilibration:
+                    monitor = ConvergenceMonitor.for_mdp(self.path("step4.1_equilibration.log"),
+                                                         self.path("step4.1_equilibration.mdp"),
+                                                         **self.convergence_options)
+                    check_stop = monitor.converged
+                    self.signals.log.emit("INFO", f"📉 Adaptive equilibration enabled (minimum {monitor.min_time_ps:g} ps, "
+                                                  f"window {monitor.window_ps:g} ps)")
+                self.run_mdrun_with_progress(cmd4, step_name, check_stop)
+                if check_stop and monitor.converged_at is not None:
+                    self.signals.log.emit("SUCCESS", f"📉 Equilibration converged at {monitor.converged_at:.1f} ps, stopped early")
                 self.check_file_exists("step4.1_equilibration.gro", step_name)
 
+                if self.io_budget is not None:
+                    # The plan only tunes output settings, a failure must not cost the equilibrated run
+                    try:
+                        self.plan_output_io()
+                    except Exception as e:
+                        self.signals.log.emit("WARNING", f"⚠️ Output I/O Planning failed, keeping the original "
+                                                         f"output settings: {e}")
+
                 # Step 5
                 step_name = "Step 5: Preprocessing Production"
                 if self._is_interrupted: raise RuntimeError("Simulation cancelled by user.")
-                cmd5 = ("gmx grompp -f step5_production.mdp -o step5_1.tpr -c step4.1_equilibration.gro "
-                        "-p topol.top -n index.ndx")
+                cmd5 = (f"gmx grompp -f {self.production_mdp} -o step5_1.tpr -c step4.1_equilibration.gro "
+                        f"-p {self.topology} -n index.ndx")
                 self.run_command(cmd5, step_name)
                 self.check_file_exists("step5_1.tpr", step_name)
                 self.signals.progress.emit(100, step_name)
 
+                if self.hmr_factor:
+                    self.run_hmr_smoke_test(gpu_ids)
+
             # Step 6 Production
             step_name = "Step 6: Production"
             if self._is_interrupted: raise RuntimeError("Simulation cancelled by user.")
-            timestep = MDPFileManager.extract_dt("step5_production.mdp")
-            nstlist = MDPFileManager.extract_and_replace_nstlist("step5_production.mdp", 300)
+            timestep = MDPFileManager.extract_dt(self.path(self.production_mdp))
+            nstlist = MDPFileManager.extract_and_replace_nstlist(self.path(self.production_mdp), 300)
             nsteps = self.calculate_nsteps(timestep)
 
-            if os.path.exists("step5_1.cpt"):
+            if os.path.exists(self.path("step5_1.cpt")):
                 self.signals.log.emit("WARNING", "⚠️ Detected checkpoint (step5_1.cpt), resuming simulation...")
                 self.logger.info("Checkpoint found, resuming production simulation")
                 if self.engine == "CPU":
@@ -220,15 +506,23 @@ class SimulationWorker(QRunnable):
                         self.num_gpus, self.num_cores, gpu_ids, self.engine,
                         extra_flags=f"-resetstep 90000 -nstlist {nstlist} -nsteps {nsteps}"
                     )
-            self.run_mdrun_with_progress(cmd6, step_name)
+            self.preemptible = True
+            try:
+                self.run_mdrun_with_progress(cmd6, step_name)
+            finally:
+                self.preemptible = False
             self.check_file_exists("step5_1.gro", step_name)
             self.signals.progress.emit(100, step_name)
 
             self.signals.log.emit("INFO", "🎉 Simulation completed. All steps succeeded!")
             self.logger.info("Simulation completed with all steps successful")
-            self.signals.finished.emit()
+            return "finished"
+
+        except SimulationPreempted:
+            return "parked"
 
         except Exception as e:
+            self.error = str(e)
             self.signals.log.emit("ERROR", f"❌ Error: {str(e)}")
             self.logger.error(f"Error: {str(e)}")
-            self.signals.finished.emit()
+            return "finished"
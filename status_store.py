@@ -0,0 +1,143 @@
+import time
+import threading
+from collections import deque
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * len(self.buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> list:
+        total, result = 0, []
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+
+class JobStatus:
+    __slots__ = ("job_id", "name", "state", "stage", "percent", "step", "ns_per_day", "eta", "steps_per_second",
+                 "last_checkpoint", "stage_started", "last_progress", "updated", "version")
+
+    def __init__(self, job_id, name: str):
+        self.job_id = job_id
+        self.name = name
+        self.state = "queued"
+        self.stage = "-"
+        self.percent = 0.0
+        self.step = None         # MD step reached in the current stage
+        self.ns_per_day = None
+        self.eta = None          # seconds remaining in the current stage
+        self.steps_per_second = None  # recent rate, drops to 0 when the run stalls
+        self.last_checkpoint = None  # mtime of the newest checkpoint file
+        self.stage_started = None
+        self.last_progress = None    # when the stage started or its step count last advanced
+        self.updated = time.time()
+        self.version = 0
+
+    def as_dict(self) -> dict:
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+
+class StatusStore:
+    FINAL_STATES = ("finished", "failed", "cancelled")
+    STAGE_BUCKETS = (1, 5, 15, 60, 300, 900, 3600, 4 * 3600, 12 * 3600, 24 * 3600, 72 * 3600)
+    LOOP_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+    # Stages that are not pipeline steps (a job waiting for its upload), shown but kept out of stage_durations
+    UNTIMED_STAGES = ("Uploading",)
+
+    def __init__(self, min_interval: float = 0.25, log_limit: int = 20000):
+        self.min_interval = min_interval
+        self.log_limit = log_limit
+        self.version = 0
+        self.stage_durations = {}    # stage name -> Histogram of completed stage wall times
+        self.loop_latency = Histogram(self.LOOP_BUCKETS)
+        self._records = {}
+        self._logs = {}
+        self._log_counts = {}
+        self._published = {}         # job_id -> time of the last version bump
+        self._lock = threading.Lock()
+
+    def register(self, job_id, name: str) -> JobStatus:
+        with self._lock:
+            record = self._records.get(job_id)
+            if record is None:
+                record = self._records[job_id] = JobStatus(job_id, name)
+                self._logs[job_id] = deque(maxlen=self.log_limit)
+                self._log_counts[job_id] = 0
+            self.version += 1
+            record.version = self.version
+            return record
+
+    def update(self, job_id, **fields) -> None:
+        now = time.time()
+        with self._lock:
+            record = self._records.get(job_id)
+            if record is None:
+                return
+            # Values are always stored; only the version bump that readers poll for is coalesced,
+            # except for stage and state changes which are published immediately
+            important = any(key in ("state", "stage") and getattr(record, key) != value
+                            for key, value in fields.items())
+            if fields.get("stage", record.stage) != record.stage:
+                self._close_stage(record, now)
+                record.stage_started = None if fields["stage"] in self.UNTIMED_STAGES else now
+                record.last_progress = now
+            elif fields.get("state") == "finished" and record.state != "finished":
+                self._close_stage(record, now)
+            if "step" in fields and fields["step"] != record.step:
+                record.last_progress = now
+            for key, value in fields.items():
+                setattr(record, key, value)
+            record.updated = now
+            if important or now - self._published.get(job_id, 0.0) >= self.min_interval:
+                self._published[job_id] = now
+                self.version += 1
+                record.version = self.version
+
+    def _close_stage(self, record: JobStatus, now: float) -> None:
+        if record.stage_started is None:
+            return
+        histogram = self.stage_durations.get(record.stage)
+        if histogram is None:
+            histogram = self.stage_durations[record.stage] = Histogram(self.STAGE_BUCKETS)
+        histogram.observe(now - record.stage_started)
+        record.stage_started = None
+
+    def observe_loop(self, seconds: float) -> None:
+        with self._lock:
+            self.loop_latency.observe(seconds)
+
+    def append_log(self, job_id, level: str, message: str) -> None:
+        log = self._logs.get(job_id)
+        if log is not None:
+            log.append((time.strftime("%X"), level, message))
+            self._log_counts[job_id] += 1
+
+    def log(self, job_id, since: int = 0):
+        # Returns the total number of lines ever logged and the retained lines after `since`
+        log = self._logs.get(job_id, ())
+        total = self._log_counts.get(job_id, 0)
+        missing = min(total - since, len(log))
+        return total, list(log)[len(log) - missing:] if missing > 0 else []
+
+    def changed_since(self, version: int):
+        with self._lock:
+            return self.version, [r.as_dict() for r in self._records.values() if r.version > version]
+
+    def histograms(self):
+        with self._lock:
+            stages = {stage: (h.cumulative(), h.sum, h.count) for stage, h in self.stage_durations.items()}
+            loop = (self.loop_latency.cumulative(), self.loop_latency.sum, self.loop_latency.count)
+        return stages, loop
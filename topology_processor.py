@@ -0,0 +1,233 @@
+import os
+import re
+import logging
+
+class TopologyProcessor:
+    logger = logging.getLogger("TopologyProcessor")
+
+    WATER_NAMES = {"SOL", "WAT", "HOH", "TIP3", "TIP3P", "TIP4P", "TIP4PEW", "TIP5P", "SPC", "SPCE", "T3P", "T4P"}
+    INCLUDE_RE = re.compile(r'^\s*#include\s+"([^"]+)"')
+    SECTION_RE = re.compile(r'^\s*\[\s*(\w+)\s*\]')
+
+    @staticmethod
+    def _resolve_include(name: str, current_dir: str, top_dir: str):
+        for base in (current_dir, top_dir):
+            path = os.path.normpath(os.path.join(base, name))
+            if os.path.exists(path):
+                return path
+        return None  # force field shipped with GROMACS (GMXDATA), left untouched
+
+    @staticmethod
+    def _load(path: str, top_dir: str, files: dict) -> None:
+        if path in files:
+            return
+        with open(path, 'r') as f:
+            lines = f.readlines()
+        files[path] = lines
+        for line in lines:
+            match = TopologyProcessor.INCLUDE_RE.match(line)
+            if match:
+                child = TopologyProcessor._resolve_include(match.group(1), os.path.dirname(path), top_dir)
+                if child:
+                    TopologyProcessor._load(child, top_dir, files)
+
+    @staticmethod
+    def _strip(line: str) -> str:
+        return line.split(';', 1)[0].strip()
+
+    @staticmethod
+    def _atomtype_masses(files: dict) -> dict:
+        masses = {}
+        for lines in files.values():
+            section = None
+            for line in lines:
+                match = TopologyProcessor.SECTION_RE.match(line)
+                if match:
+                    section = match.group(1).lower()
+                    continue
+                data = TopologyProcessor._strip(line)
+                if section != "atomtypes" or not data or data.startswith('#'):
+                    continue
+                fields = data.split()
+                # name [bondtype] [at.num] mass charge ptype sigma epsilon
+                ptype = next((i for i in range(2, len(fields)) if fields[i] in ("A", "D", "S", "V")), None)
+                if ptype is None:
+                    continue
+                try:
+                    masses[fields[0]] = float(fields[ptype - 2])
+                except ValueError:
+                    pass
+        return masses
+
+    @staticmethod
+    def _parse_molecules(lines: list, type_masses: dict) -> list:
+        # Collect [ atoms ] and [ bonds ] per moleculetype
+        molecules = []
+        current = None
+        section = None
+        for index, line in enumerate(lines):
+            match = TopologyProcessor.SECTION_RE.match(line)
+            if match:
+                section = match.group(1).lower()
+                if section == "moleculetype":
+                    current = {"name": None, "atoms": {}, "bonds": []}
+                    molecules.append(current)
+                continue
+            data = TopologyProcessor._strip(line)
+            if current is None or not data or data.startswith('#'):
+                continue
+            fields = data.split()
+            if section == "moleculetype" and current["name"] is None:
+                current["name"] = fields[0]
+            elif section == "atoms" and len(fields) >= 5:
+                atype = fields[1]
+                mass = float(fields[7]) if len(fields) >= 8 else type_masses.get(atype)
+                current["atoms"][int(fields[0])] = {"line": index, "fields": fields, "mass": mass,
+                                                    "explicit": len(fields) >= 8}
+            elif section == "bonds" and len(fields) >= 2:
+                current["bonds"].append((int(fields[0]), int(fields[1])))
+        return molecules
+
+    @staticmethod
+    def _is_hydrogen_bond(atoms: dict, h: int, heavy: int) -> bool:
+        mh, mheavy = atoms[h]["mass"], atoms[heavy]["mass"]
+        return mh is not None and mheavy is not None and 0.5 < mh < 1.5 and mheavy >= 1.5
+
+    @staticmethod
+    def _repartition_molecules(lines: list, factor: float, type_masses: dict, stats: dict) -> bool:
+        # Rewrite masses of every non-water moleculetype in place
+        molecules = TopologyProcessor._parse_molecules(lines, type_masses)
+        changed = False
+        for molecule in molecules:
+            if (molecule["name"] or "").upper() in TopologyProcessor.WATER_NAMES:
+                continue
+            atoms = molecule["atoms"]
+            new_masses = {nr: atom["mass"] for nr, atom in atoms.items()}
+            for ai, aj in molecule["bonds"]:
+                if ai not in atoms or aj not in atoms:
+                    continue
+                for h, heavy in ((ai, aj), (aj, ai)):
+                    if not TopologyProcessor._is_hydrogen_bond(atoms, h, heavy):
+                        continue
+                    mh = atoms[h]["mass"]
+                    shift = mh * (factor - 1)
+                    new_masses[h] = mh * factor
+                    new_masses[heavy] -= shift
+            molecule_changed = False
+            for nr, atom in atoms.items():
+                if atom["mass"] is None or abs(new_masses[nr] - atom["mass"]) < 1e-9:
+                    continue
+                if new_masses[nr] <= 0:
+                    raise ValueError(f"Repartitioning leaves atom {nr} of {molecule['name']} with mass {new_masses[nr]:.3f}")
+                fields = list(atom["fields"])
+                mass_text = f"{new_masses[nr]:.5f}"
+                if atom["explicit"]:
+                    fields[7] = mass_text
+                else:
+                    fields = fields[:7] + ["0.0"] * (7 - len(fields)) + [mass_text]
+                original = lines[atom["line"]]
+                comment = original[len(original.split(';', 1)[0]):].rstrip("\n")
+                lines[atom["line"]] = " " + " ".join(f"{field:>10}" for field in fields) + (f" {comment}" if comment else "") + "\n"
+                molecule_changed = True
+            if molecule_changed:
+                stats[molecule["name"]] = sum(1 for nr in atoms if 0.5 < (atoms[nr]["mass"] or 0) < 1.5)
+                changed = True
+        return changed
+
+    @staticmethod
+    def molecule_masses(top_path: str) -> dict:
+        top_path = os.path.abspath(top_path)
+        files = {}
+        TopologyProcessor._load(top_path, os.path.dirname(top_path), files)
+        type_masses = TopologyProcessor._atomtype_masses(files)
+        molecules = {}
+        for lines in files.values():
+            for molecule in TopologyProcessor._parse_molecules(lines, type_masses):
+                molecules[molecule["name"]] = molecule
+        return molecules
+
+    @staticmethod
+    def verify(original_top: str, hmr_top: str, factor: float) -> int:
+        # Each moleculetype keeps its total mass, bonded hydrogens are scaled exactly and no atom goes light
+        before = TopologyProcessor.molecule_masses(original_top)
+        after = TopologyProcessor.molecule_masses(hmr_top)
+        checked = 0
+        for name, molecule in before.items():
+            atoms = molecule["atoms"]
+            new_atoms = after.get(name, {}).get("atoms", {})
+            if set(new_atoms) != set(atoms):
+                raise ValueError(f"{name}: atoms differ between {original_top} and {hmr_top}")
+            if any(atom["mass"] is None for atom in atoms.values()):
+                continue
+            new = {nr: new_atoms[nr]["mass"] for nr in atoms}
+            old_total, new_total = sum(atom["mass"] for atom in atoms.values()), sum(new.values())
+            # Masses are written with 5 decimals
+            if abs(new_total - old_total) > 1e-5 * len(atoms) + 1e-6:
+                raise ValueError(f"{name}: total mass changed from {old_total:.5f} to {new_total:.5f}")
+            water = (name or "").upper() in TopologyProcessor.WATER_NAMES
+            hydrogens = {h for ai, aj in molecule["bonds"] if ai in atoms and aj in atoms
+                         for h, heavy in ((ai, aj), (aj, ai)) if TopologyProcessor._is_hydrogen_bond(atoms, h, heavy)}
+            for nr, atom in atoms.items():
+                expected = atom["mass"] * factor if nr in hydrogens and not water else None
+                if expected is not None and abs(new[nr] - expected) > 1e-4:
+                    raise ValueError(f"{name}: hydrogen {nr} has mass {new[nr]:.5f}, expected {expected:.5f}")
+                if water and abs(new[nr] - atom["mass"]) > 1e-9:
+                    raise ValueError(f"{name}: water atom {nr} mass changed to {new[nr]:.5f}")
+                if new[nr] <= 0:
+                    raise ValueError(f"{name}: atom {nr} has non-positive mass {new[nr]:.5f}")
+            checked += 1
+        return checked
+
+    @staticmethod
+    def _hmr_name(path: str, suffix: str) -> str:
+        root, ext = os.path.splitext(path)
+        return f"{root}{suffix}{ext}"
+
+    @staticmethod
+    def repartition(top_path: str, factor: float = 3.0, suffix: str = "_hmr") -> str:
+        TopologyProcessor.logger.debug(f"⚖️ Repartitioning hydrogen masses in {top_path} (factor {factor})")
+        top_path = os.path.abspath(top_path)
+        top_dir = os.path.dirname(top_path)
+        files = {}
+        TopologyProcessor._load(top_path, top_dir, files)
+        type_masses = TopologyProcessor._atomtype_masses(files)
+
+        stats = {}
+        changed = {path for path, lines in files.items()
+                   if TopologyProcessor._repartition_molecules(lines, factor, type_masses, stats)}
+        if not changed:
+            TopologyProcessor.logger.warning("⚠️ No hydrogens found to repartition (already repartitioned?)")
+            return top_path
+
+        # Every file on an include path leading to a changed file needs its own copy
+        def needs_copy(path, seen=()):
+            if path in changed:
+                return True
+            for line in files[path]:
+                match = TopologyProcessor.INCLUDE_RE.match(line)
+                if match:
+                    child = TopologyProcessor._resolve_include(match.group(1), os.path.dirname(path), top_dir)
+                    if child and child not in seen and needs_copy(child, seen + (path,)):
+                        return True
+            return False
+
+        copies = {path for path in files if path == top_path or needs_copy(path)}
+        for path in copies:
+            output = []
+            for line in files[path]:
+                match = TopologyProcessor.INCLUDE_RE.match(line)
+                if match:
+                    child = TopologyProcessor._resolve_include(match.group(1), os.path.dirname(path), top_dir)
+                    if child in copies:
+                        line = line.replace(match.group(1), TopologyProcessor._hmr_name(match.group(1), suffix))
+                output.append(line)
+            with open(TopologyProcessor._hmr_name(path, suffix), 'w') as f:
+                f.writelines(output)
+
+        for name, count in stats.items():
+            TopologyProcessor.logger.info(f"✅ {name}: {count} hydrogens scaled by {factor}")
+        output_path = TopologyProcessor._hmr_name(top_path, suffix)
+        TopologyProcessor.logger.info(f"📄 Repartitioned topology written: {output_path}")
+        checked = TopologyProcessor.verify(top_path, output_path, factor)
+        TopologyProcessor.logger.info(f"🔍 Masses verified for {checked} molecule types")
+        return output_path